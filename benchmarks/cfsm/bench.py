@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from cflang.cfsm.stack_machine import StackMachine
+from cflang.io.memory_binary_reader import MemoryBinaryReader
+from cflang.cfsm.workloads import WORKLOADS, THRESHOLD, compare
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+def measure(name, repeat=5, predecode=False, fuse=False, jit=False):
+    image = WORKLOADS[name]()
+    best = None
+    load_time = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        sm = StackMachine(MemoryBinaryReader(image), predecode=predecode, fuse=fuse,
+                          jit=jit)
+        loaded = time.perf_counter()
+        sm.run()
+        done = time.perf_counter()
+
+        run = {
+            "steps": sm.steps,
+            "load_time": loaded - start,
+            "run_time": done - loaded,
+            "ips": sm.steps / (done - loaded),
+        }
+        if best is None or run["ips"] > best["ips"]:
+            best = run
+        if load_time is None or run["load_time"] < load_time:
+            load_time = run["load_time"]
+
+    best["load_time"] = load_time
+
+    # linux reports kilobytes
+    best["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return best
+
+# one fresh process per workload so peak rss is not shared between them
+def run_suite(names, repeat=5, predecode=False, fuse=False, jit=False):
+    results = {}
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results[name] = pool.submit(measure, name, repeat, predecode, fuse, jit).result()
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cfsm stack machine")
+    parser.add_argument("workloads", nargs="*", default=sorted(WORKLOADS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--predecode", action="store_true")
+    parser.add_argument("--fuse", action="store_true")
+    parser.add_argument("--jit", action="store_true")
+    parser.add_argument("--save", nargs="?", const=BASELINE, default=None,
+                        help="write results as the new baseline")
+    parser.add_argument("--compare", nargs="?", const=BASELINE, default=None,
+                        help="flag regressions against a stored baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    results = run_suite(args.workloads, args.repeat, args.predecode, args.fuse,
+                        args.jit)
+    for name, result in results.items():
+        print(f"{name:>14} {result['ips']:>12.0f} ips"
+              f" {result['load_time'] * 1000:>8.2f} ms load"
+              f" {result['peak_rss_kb']:>8} kb rss")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+        for name, metric, before, after in regressions:
+            print(f"regression: {name} {metric} {before:.6g} -> {after:.6g}")
+
+        if regressions:
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
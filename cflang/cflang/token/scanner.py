@@ -0,0 +1,11 @@
+from cflang.lexer.scanner import Scanner as LexerScanner, read_source
+from .tokenizer import LANGUAGE
+
+# scans cflang source already held as a str, without a stream
+class Scanner(LexerScanner):
+    def __init__(self, text, source=None):
+        super().__init__(LANGUAGE, text, source)
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(read_source(path), path)
@@ -0,0 +1,84 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from cflang.io.file_binary_reader import FileBinaryReader
+from .stack_machine import StackMachine
+from .machine_fault import MachineFault
+from .run_status import RunStatus
+from .decode_cache import DecodeCache
+
+TIMEOUT = "timeout"
+
+# instructions run between wall clock checks
+SLICE_STEPS = 10000
+
+def run_program(path, max_steps=None, timeout=None, slice_steps=SLICE_STEPS,
+                cache_dir=None):
+    start = time.monotonic()
+    result = {
+        "path": path,
+        "status": None,
+        "exit_value": None,
+        "steps": 0,
+        "fault": None,
+    }
+
+    try:
+        cache = DecodeCache(cache_dir) if cache_dir is not None else None
+        sm = StackMachine(FileBinaryReader(path), predecode=True,
+                          decode_cache=cache)
+    except OSError as err:
+        result["status"] = RunStatus.FAULT.name.lower()
+        result["fault"] = str(err)
+        return result
+
+    remaining = max_steps
+    while True:
+        steps = slice_steps if remaining is None else min(slice_steps, remaining)
+        status = sm.run_for(steps)
+        if remaining is not None:
+            remaining -= steps
+
+        if status != RunStatus.BUDGET_EXHAUSTED or remaining == 0:
+            result["status"] = status.name.lower()
+            break
+
+        if timeout is not None and time.monotonic() - start >= timeout:
+            result["status"] = TIMEOUT
+            break
+
+    result["steps"] = sm.steps
+    if sm.fault is not None:
+        result["fault"] = str(sm.fault)
+    elif sm.status == RunStatus.HALTED:
+        try:
+            result["exit_value"] = sm._read_dword_mem(sm.sp)
+        except MachineFault as err:
+            result["fault"] = str(err)
+
+    result["elapsed"] = time.monotonic() - start
+    return result
+
+def collect_programs(sources):
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(
+                os.path.join(source, name)
+                for name in sorted(os.listdir(source))
+                if os.path.isfile(os.path.join(source, name)))
+        else:
+            paths.append(source)
+
+    return paths
+
+# yields each program's result as soon as it completes
+def run_batch(paths, max_steps=None, timeout=None, workers=None, cache_dir=None):
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [
+            pool.submit(run_program, path, max_steps, timeout, SLICE_STEPS,
+                        cache_dir)
+            for path in paths
+        ]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,95 @@
+from .run_status import RunStatus
+from .stack_machine import StopExecution
+
+# breakpoints are trap entries patched into the machine's decode table and
+# watchpoints wrap the handler table, so a machine without a debugger runs
+# its usual loop. attaching turns off fusion and compiled blocks, as a
+# breakpoint inside a fused entry or block would never be reached
+class Debugger:
+    def __init__(self, machine):
+        self.machine = machine
+        self.breakpoints = set()
+        self.watchpoints = {}
+        # the breakpoint the machine is stopped at, and the one to run
+        # through rather than stop at again on resuming
+        self.stopped_at = None
+        self.resume_pc = None
+        # (address, old, new) for the watchpoint that stopped the last run
+        self.last_watch = None
+        machine.instrument(self._wrap)
+
+    def detach(self):
+        for pc in list(self.breakpoints):
+            self.remove_breakpoint(pc)
+
+        self.watchpoints.clear()
+        self.machine.uninstrument(self._wrap)
+
+    def add_breakpoint(self, pc):
+        self.breakpoints.add(pc)
+        entry = (self._trap, pc, pc)
+        self.machine.traps[pc] = entry
+        self.machine.decoded[pc] = entry
+
+    def remove_breakpoint(self, pc):
+        self.breakpoints.discard(pc)
+        machine = self.machine
+        if machine.traps.pop(pc, None) is not None:
+            machine.decoded.pop(pc, None)
+
+    # stops after any op that changes the dword at address
+    def watch(self, address):
+        self.watchpoints[address] = self.machine._read_dword_mem(address)
+        self._reinstrument()
+
+    def unwatch(self, address):
+        del self.watchpoints[address]
+        self._reinstrument()
+
+    def step(self):
+        return self.cont(1)
+
+    def cont(self, max_steps=None):
+        machine = self.machine
+        if machine.pc == self.stopped_at:
+            self.resume_pc = machine.pc
+
+        self.stopped_at = None
+        self.last_watch = None
+        try:
+            return machine.run_for(max_steps)
+        finally:
+            self.resume_pc = None
+
+    def _reinstrument(self):
+        # rebuilding the table keeps the traps in place
+        self.machine._rebuild_dispatch()
+
+    def _trap(self, pc, _):
+        if self.resume_pc != pc:
+            self.stopped_at = pc
+            raise StopExecution(RunStatus.BREAK, pc, executed=False)
+
+        self.resume_pc = None
+        handler, arg, next_pc = self.machine._decode(pc)
+        return handler(arg, next_pc)
+
+    def _wrap(self, code, handler):
+        if not self.watchpoints:
+            return handler
+
+        read = self.machine._read_dword_mem
+        watchpoints = self.watchpoints
+
+        def watched(arg, pc):
+            next_pc = handler(arg, pc)
+            for address, old in watchpoints.items():
+                new = read(address)
+                if new != old:
+                    watchpoints[address] = new
+                    self.last_watch = (address, old, new)
+                    raise StopExecution(RunStatus.BREAK, next_pc)
+
+            return next_pc
+
+        return watched
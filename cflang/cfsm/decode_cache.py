@@ -0,0 +1,161 @@
+import hashlib
+import marshal
+import os
+import sys
+from .opcode import Opcode
+from . import fusion
+from . import jit
+from .stack_machine import StackMachine
+
+# bump when the layout of a cache entry or the generated block code changes
+CACHE_FORMAT = 1
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# patterns as plain ints, marshal cannot write enum members
+FUSED_PATTERNS = {
+    handler: tuple(int(code) for code in pattern)
+    for pattern, (handler, _) in fusion.FUSIONS.items()
+}
+
+# modules whose code decides what a cached table holds and how it runs
+SOURCES = (jit, fusion, sys.modules[StackMachine.__module__])
+
+# entries from another opcode set, handler set, fusion table, block compiler
+# or python (marshal and code objects are version specific) never match. the
+# source of the handlers, fused handlers and block compiler is hashed in, so
+# any edit to them drops entries made by the old code
+def version_stamp():
+    parts = [
+        str(CACHE_FORMAT),
+        sys.implementation.cache_tag or "",
+        ",".join(f"{op.name}={op.value}" for op in Opcode),
+        ",".join(str(int(op)) for op in sorted(StackMachine.handlers)),
+        ",".join(".".join(str(int(code)) for code in pattern)
+                 for pattern in fusion.FUSIONS),
+        str(jit.MAX_BLOCK),
+    ]
+    digest = hashlib.sha256("|".join(parts).encode())
+    for module in SOURCES:
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+
+    return digest.hexdigest()
+
+VERSION = version_stamp()
+
+# stores a machine's decode table, keyed by a hash of its image and options.
+# files are touched when read, so eviction by mtime drops the least recently
+# used entries first
+class DecodeCache:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, machine):
+        digest = hashlib.sha256()
+        digest.update(VERSION.encode())
+        digest.update(bytes((machine.fuse, machine.jit)))
+        digest.update(machine.memory[:machine.code_end])
+        return digest.hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".decoded")
+
+    # installs the cached table into machine, returns False on a miss
+    def load(self, machine):
+        path = self._file(self.key(machine))
+        try:
+            with open(path, "rb") as f:
+                version, records = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+
+        if version != VERSION:
+            return False
+
+        decoded = {}
+        blocks = []
+        try:
+            for pc, kind, value, arg, next_pc in records:
+                if kind == "op":
+                    handler = machine.dispatch[value]
+                elif kind == "fused":
+                    handler = machine.fused[value][0]
+                else:
+                    handler = jit.load_block(value).__get__(machine)
+                    blocks.append((pc, next_pc))
+
+                decoded[pc] = (handler, arg, next_pc)
+        except (KeyError, ValueError, TypeError):
+            # handlers or patterns this code does not have
+            return False
+
+        try:
+            os.utime(path)
+        except OSError:
+            # evicted since it was read, the table read is still good
+            pass
+
+        machine.decoded.update(decoded)
+        for pc, next_pc in blocks:
+            machine._own_block(pc, next_pc)
+
+        return True
+
+    def store(self, machine):
+        if machine.instruments:
+            # wrapped handlers are not the ones a fresh machine would bind
+            return
+
+        records = []
+        for pc, (handler, arg, next_pc) in sorted(machine.decoded.items()):
+            func = handler.__func__
+            pattern = FUSED_PATTERNS.get(func)
+            if pattern is not None:
+                records.append((pc, "fused", pattern, arg, next_pc))
+            elif func.__name__ == "block":
+                code = bytes(machine.memory[pc:next_pc])
+                records.append((pc, "block", jit.block_code(pc, code), arg, next_pc))
+            else:
+                code = machine._read_dword_mem(pc) & 0xff
+                records.append((pc, "op", code, arg, next_pc))
+
+        key = self.key(machine)
+        path = self._file(key)
+        # written aside and renamed, so concurrent runs never read a partial file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            marshal.dump((VERSION, tuple(records)), f)
+
+        os.replace(tmp, path)
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".decoded"):
+                continue
+
+            path = os.path.join(self.path, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+            total -= size
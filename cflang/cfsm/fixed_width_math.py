@@ -1,38 +1,154 @@
+from array import array
+try:
+    import numpy as np
+except ImportError:
+    np = None
 from .bit_ops import top_bit_mask
-from .flag_result import FlagResult
+from .data_size import BYTE, WORD, DWORD
+from .flag_result import FlagResult, OVERFLOW, ZERO, CARRY, NEGATIVE
 
-def add(size, n1, n2):
+# the width specific functions expect operands already in range for the width,
+# value functions return the wrapped result and flags functions return the
+# flag_result bits the operation would set
+
+def _make_add(size):
     max_usgn = 1 << size * 8
+    value_mask = max_usgn - 1
+    mask = top_bit_mask(size)
+
+    def add_value(n1, n2):
+        return (n1 + n2) & value_mask
 
-    carry = False
-    if max_usgn - n1 <= n2:
-        result = n1 - max_usgn + n2
-        carry = True
-    else:
-        result = n1 + n2
+    def add_flags(n1, n2):
+        total = n1 + n2
+        flags = CARRY if total >= max_usgn else 0
+        result = total & value_mask
+        if result & mask:
+            flags |= NEGATIVE
+            if not (n1 | n2) & mask:
+                flags |= OVERFLOW
+        elif not result:
+            flags |= ZERO
 
+        return flags
+
+    return add_value, add_flags
+
+def _make_sub(size):
+    max_usgn = 1 << size * 8
+    value_mask = max_usgn - 1
     mask = top_bit_mask(size)
-    overflow = True if not n1 & mask and not n2 & mask and result & mask else False
-    negative = True if result & mask else False
-    zero = not bool(result)
 
-    return result, FlagResult(zero=zero, negative=negative, carry=carry, overflow=overflow)
+    def sub_value(n1, n2):
+        return (n1 - n2) & value_mask
+
+    def sub_flags(n1, n2):
+        flags = CARRY if n1 < n2 else 0
+        result = (n1 - n2) & value_mask
+        if result & mask:
+            flags |= NEGATIVE
+        else:
+            if not result:
+                flags |= ZERO
+            if n1 & mask and not n2 & mask:
+                flags |= OVERFLOW
+
+        return flags
+
+    return sub_value, sub_flags
+
+add_byte, add_byte_flags = _make_add(BYTE)
+add_word, add_word_flags = _make_add(WORD)
+add_dword, add_dword_flags = _make_add(DWORD)
+
+sub_byte, sub_byte_flags = _make_sub(BYTE)
+sub_word, sub_word_flags = _make_sub(WORD)
+sub_dword, sub_dword_flags = _make_sub(DWORD)
+
+ADDERS = {
+    BYTE: (add_byte, add_byte_flags),
+    WORD: (add_word, add_word_flags),
+    DWORD: (add_dword, add_dword_flags),
+}
+
+SUBTRACTORS = {
+    BYTE: (sub_byte, sub_byte_flags),
+    WORD: (sub_word, sub_word_flags),
+    DWORD: (sub_dword, sub_dword_flags),
+}
+
+def _ops(table, make, size):
+    ops = table.get(size)
+    if ops is None:
+        ops = make(size)
+        table[size] = ops
+
+    return ops
+
+def add(size, n1, n2):
+    add_value, add_flags = _ops(ADDERS, _make_add, size)
+    return add_value(n1, n2), FlagResult.from_bits(add_flags(n1, n2))
 
 def sub(size, n1, n2):
-    max_usgn = 1 << size * 8
+    sub_value, sub_flags = _ops(SUBTRACTORS, _make_sub, size)
+    return sub_value(n1, n2), FlagResult.from_bits(sub_flags(n1, n2))
+
+def _typecode(size):
+    for code in 'BHIL':
+        if array(code).itemsize == size:
+            return code
 
-    carry = False
-    if n1 < n2:
-        carry = True
-        result = max_usgn - n2 + n1
-    else:
-        result = n1 - n2
+    raise ValueError(f'no array type for size {size}')
 
+# whole array versions of the value and flags functions. operands are int64
+# arrays in range for the width, each flag is found for every element at once
+def _add_arrays(size, n1s, n2s):
+    max_usgn = 1 << size * 8
+    mask = top_bit_mask(size)
+    total = n1s + n2s
+    result = total & (max_usgn - 1)
+    negative = (result & mask) != 0
+    flags = np.where(total >= max_usgn, CARRY, 0)
+    flags |= np.where(negative, NEGATIVE, 0)
+    flags |= np.where(negative & ((n1s | n2s) & mask == 0), OVERFLOW, 0)
+    flags |= np.where(~negative & (result == 0), ZERO, 0)
+    return result, flags
+
+def _sub_arrays(size, n1s, n2s):
     mask = top_bit_mask(size)
-    overflow = True if n1 & mask and not n2 & mask and not result & mask else False
-    negative = True if result & mask else False
-    zero = not bool(result)
+    result = (n1s - n2s) & ((1 << size * 8) - 1)
+    negative = (result & mask) != 0
+    flags = np.where(n1s < n2s, CARRY, 0)
+    flags |= np.where(negative, NEGATIVE, 0)
+    flags |= np.where(~negative & (result == 0), ZERO, 0)
+    flags |= np.where(~negative & (n1s & mask != 0) & (n2s & mask == 0), OVERFLOW, 0)
+    return result, flags
+
+def _vectorized(size):
+    # sums of these widths fit an int64 with room for the carry
+    return np is not None and size in (BYTE, WORD, DWORD)
+
+def _batch(arrays_op, size, n1s, n2s):
+    n1s = np.asarray(n1s, dtype=np.int64)
+    n2s = np.asarray(n2s, dtype=np.int64)
+    results, flags = arrays_op(size, n1s, n2s)
+    return results.astype(np.dtype(f'u{size}')), flags.astype(np.uint8)
+
+# return (results, flags) arrays for pairwise operands, computed over whole
+# numpy arrays. without numpy, or for other widths, they fall back to
+# one scalar call per element and return array.array
+def add_batch(size, n1s, n2s):
+    if _vectorized(size):
+        return _batch(_add_arrays, size, n1s, n2s)
 
-    return result, FlagResult(zero=zero, negative=negative, carry=carry, overflow=overflow)
+    add_value, add_flags = _ops(ADDERS, _make_add, size)
+    return (array(_typecode(size), map(add_value, n1s, n2s)),
+            array('B', map(add_flags, n1s, n2s)))
 
+def sub_batch(size, n1s, n2s):
+    if _vectorized(size):
+        return _batch(_sub_arrays, size, n1s, n2s)
 
+    sub_value, sub_flags = _ops(SUBTRACTORS, _make_sub, size)
+    return (array(_typecode(size), map(sub_value, n1s, n2s)),
+            array('B', map(sub_flags, n1s, n2s)))
@@ -14,6 +14,30 @@ class FlagResult:
     carry: bool = False
     negative: bool = False
 
+    @classmethod
+    def from_bits(cls, bits):
+        return cls(
+            overflow=bool(bits & OVERFLOW),
+            zero=bool(bits & ZERO),
+            carry=bool(bits & CARRY),
+            negative=bool(bits & NEGATIVE))
+
+    def to_bits(self):
+        bits = 0
+        if self.overflow:
+            bits |= OVERFLOW
+
+        if self.zero:
+            bits |= ZERO
+
+        if self.carry:
+            bits |= CARRY
+
+        if self.negative:
+            bits |= NEGATIVE
+
+        return bits
+
     def select(self, mask):
         result = {}
 
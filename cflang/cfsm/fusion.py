@@ -0,0 +1,229 @@
+from collections import Counter, deque
+from .opcode import Opcode
+from .data_size import DWORD
+from .machine_fault import MachineFault
+from .run_status import RunStatus
+from . import fixed_width_math as fwm
+
+# fused handlers perform the same memory reads and writes, in the same order,
+# as the ops they replace, and only set sp and the flags once nothing else can
+# fault. each one also counts the ops it folds in towards steps, which is what
+# run_for charges its budget by
+
+# ops followed by an immediate dword
+IMMEDIATE_OPS = frozenset((Opcode.PUSHI, Opcode.JMP, Opcode.IF))
+
+# raised in place of a fault inside a fused entry. pc is the component op that
+# faulted and executed the number of ops before it that completed
+class FusedFault(Exception):
+    def __init__(self, fault, pc, executed):
+        super().__init__()
+        self.fault = fault
+        self.pc = pc
+        self.executed = executed
+
+# bytes of code covered by a sequence of ops
+def span(pattern):
+    return sum(2 * DWORD if code in IMMEDIATE_OPS else DWORD for code in pattern)
+
+# a fault leaves memory as the unfused ops would have at the same point and
+# the registers as they were on entry, so the ops are run again one at a time
+# from the start of the entry to find the one that faults
+def _refault(m, pattern, pc):
+    pc -= span(pattern)
+    for executed in range(len(pattern)):
+        try:
+            pc = m._step(pc)
+        except MachineFault as err:
+            raise FusedFault(err, pc, executed) from None
+
+    # the run loop counts the dispatch itself
+    m.steps += len(pattern) - 1
+    return pc
+
+PUSHI_ADDI = (Opcode.PUSHI, Opcode.ADDI)
+PUSHI_SUBI = (Opcode.PUSHI, Opcode.SUBI)
+PUSHI_FCHI = (Opcode.PUSHI, Opcode.FCHI)
+DUPI_IF = (Opcode.DUPI, Opcode.IF)
+OVERI_OVERI_SUBI = (Opcode.OVERI, Opcode.OVERI, Opcode.SUBI)
+
+def _pushi_addi(m, arg, pc):
+    sp = m.sp
+    try:
+        m._write_dword_mem(fwm.sub_dword(sp, DWORD), arg)
+        arg1 = m._read_dword_mem(sp)
+    except MachineFault:
+        return _refault(m, PUSHI_ADDI, pc)
+
+    result = fwm.add_dword(arg1, arg)
+    m._flag_value = result
+    m._flag_alu = (fwm.add_dword_flags, arg1, arg)
+    m._write_dword_mem(sp, result)
+    m.steps += 1
+    return pc
+
+def _pushi_subi(m, arg, pc):
+    sp = m.sp
+    try:
+        m._write_dword_mem(fwm.sub_dword(sp, DWORD), arg)
+        arg1 = m._read_dword_mem(sp)
+    except MachineFault:
+        return _refault(m, PUSHI_SUBI, pc)
+
+    result = fwm.sub_dword(arg1, arg)
+    m._flag_value = result
+    m._flag_alu = (fwm.sub_dword_flags, arg1, arg)
+    m._write_dword_mem(sp, result)
+    m.steps += 1
+    return pc
+
+def _pushi_fchi(m, arg, pc):
+    sp = fwm.sub_dword(m.sp, DWORD)
+    try:
+        m._write_dword_mem(sp, arg)
+        value = m._read_dword_mem(arg)
+    except MachineFault:
+        return _refault(m, PUSHI_FCHI, pc)
+
+    m._write_dword_mem(sp, value)
+    m.sp = sp
+    m._flag_value = value
+    m.steps += 1
+    return pc
+
+def _dupi_if(m, arg, pc):
+    sp = m.sp
+    try:
+        value = m._read_dword_mem(sp)
+        m._write_dword_mem(fwm.sub_dword(sp, DWORD), value)
+    except MachineFault:
+        return _refault(m, DUPI_IF, pc)
+
+    m._flag_value = value
+    m.steps += 1
+    if value == 0:
+        return arg
+
+    return pc
+
+def _overi_overi_subi(m, arg, pc):
+    sp = m.sp
+    sp1 = fwm.sub_dword(sp, DWORD)
+    try:
+        arg1 = m._read_dword_mem(sp + DWORD)
+        m._write_dword_mem(sp1, arg1)
+        arg2 = m._read_dword_mem(sp)
+        m._write_dword_mem(fwm.sub_dword(sp1, DWORD), arg2)
+    except MachineFault:
+        return _refault(m, OVERI_OVERI_SUBI, pc)
+
+    result = fwm.sub_dword(arg1, arg2)
+    m._flag_value = result
+    m._flag_alu = (fwm.sub_dword_flags, arg1, arg2)
+    m._write_dword_mem(sp1, result)
+    m.sp = sp1
+    m.steps += 2
+    return pc
+
+# pattern: (handler, index of the op whose immediate is passed as arg)
+FUSIONS = {
+    PUSHI_ADDI: (_pushi_addi, 0),
+    PUSHI_SUBI: (_pushi_subi, 0),
+    PUSHI_FCHI: (_pushi_fchi, 0),
+    DUPI_IF: (_dupi_if, 1),
+    OVERI_OVERI_SUBI: (_overi_overi_subi, None),
+}
+
+FUSION_STARTS = frozenset(pattern[0] for pattern in FUSIONS)
+
+MAX_FUSION = max(len(pattern) for pattern in FUSIONS)
+
+# the most bytes a fused entry covers
+MAX_SPAN = max(span(pattern) for pattern in FUSIONS)
+
+def bind_fusions(machine):
+    return {
+        pattern: (handler.__get__(machine), arg_index)
+        for pattern, (handler, arg_index) in FUSIONS.items()
+    }
+
+# returns a fused (handler, arg, next_pc) entry for the sequence at pc,
+# or None if the ops there do not start a known sequence
+def fuse_at(machine, pc):
+    code, arg, next_pc = machine._decode_op(pc)
+    if code not in FUSION_STARTS:
+        return None
+
+    codes = [code]
+    args = [arg]
+    ends = [next_pc]
+    while len(codes) < MAX_FUSION and ends[-1] < machine.code_end:
+        try:
+            code, arg, next_pc = machine._decode_op(ends[-1])
+        except MachineFault:
+            break
+
+        codes.append(code)
+        args.append(arg)
+        ends.append(next_pc)
+
+    for n in range(len(codes), 1, -1):
+        fused = machine.fused.get(tuple(codes[:n]))
+        if fused is not None:
+            handler, arg_index = fused
+            arg = 0 if arg_index is None else args[arg_index]
+            return handler, arg, ends[n - 1]
+
+    return None
+
+class SequenceProfiler:
+    def __init__(self, lengths=(2, 3)):
+        self.lengths = lengths
+        self.counts = Counter()
+
+    # single steps the machine, counting each run of consecutive ops that
+    # execute by falling through from one to the next
+    def profile(self, machine, max_steps=None):
+        if machine.fuse or machine.jit:
+            # a single step would cover several ops
+            raise ValueError('cannot profile sequences on a fusing or compiling machine')
+
+        window = deque(maxlen=max(self.lengths))
+        next_pc = None
+        steps = 0
+        while max_steps is None or steps < max_steps:
+            pc = machine.pc
+            try:
+                code, _, op_end = machine._decode_op(pc)
+            except MachineFault:
+                code = None
+
+            status = machine.run_for(1)
+            steps += 1
+            if code is None:
+                break
+
+            if pc != next_pc:
+                window.clear()
+
+            window.append(code)
+            next_pc = op_end
+            for n in self.lengths:
+                if len(window) >= n:
+                    self.counts[tuple(window)[-n:]] += 1
+
+            if status != RunStatus.BUDGET_EXHAUSTED:
+                break
+
+        return self.counts
+
+    def most_common(self, n=None):
+        return [
+            (tuple(Opcode(code) for code in sequence), count)
+            for sequence, count in self.counts.most_common(n)
+        ]
+
+    def report(self, n=10):
+        return "\n".join(
+            f"{count:>10} {' '.join(op.name for op in sequence)}"
+            for sequence, count in self.most_common(n))
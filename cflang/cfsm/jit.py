@@ -0,0 +1,316 @@
+from functools import lru_cache
+from .opcode import Opcode
+from .data_size import DWORD
+from .machine_fault import MachineFault
+from .run_status import RunStatus
+from . import fixed_width_math as fwm
+
+# a block is a run of ops compiled into one python function with the stack
+# held in locals. pops below the block's own pushes read the machine stack,
+# and only the final stack is written back, so dead slots below sp are not
+# written the way separate ops would write them. every memory access a block
+# makes is checked against sp on entry; if any could fault or touch code the
+# block runs its first op through the interpreter instead, so faults and code
+# invalidation are always handled by the plain handlers. a block counts every
+# op it runs into steps, and run_for charges its budget by steps, entering no
+# block once fewer than MAX_BLOCK ops of budget are left
+
+# ops a block can contain without ending
+STRAIGHT_OPS = frozenset((
+    Opcode.NOP, Opcode.PUSHI, Opcode.ADDI, Opcode.SUBI, Opcode.DROPI,
+    Opcode.ANDI, Opcode.ORI, Opcode.XORI, Opcode.DUPI, Opcode.OVERI,
+    Opcode.SWAPI,
+))
+
+# ops that end a block, included as its last op
+EXIT_OPS = frozenset((
+    Opcode.JMP, Opcode.IF, Opcode.CALL, Opcode.RET, Opcode.HALT,
+))
+
+# anything else (memory, registers, breakpoints) is left to the interpreter
+
+MAX_BLOCK = 64
+
+FOLDS = {
+    "+": lambda a, b: (a + b) & 0xffffffff,
+    "-": lambda a, b: (a - b) & 0xffffffff,
+    "&": lambda a, b: a & b,
+    "|": lambda a, b: a | b,
+    "^": lambda a, b: a ^ b,
+}
+
+# block starting points: branch targets, call targets pushed just before a
+# CALL, and the op after anything that leaves a block
+def leaders(machine):
+    found = {0}
+    prev = None
+    pc = 0
+    while pc < machine.code_end:
+        try:
+            code, arg, next_pc = machine._decode_op(pc)
+        except MachineFault:
+            pc += DWORD
+            prev = None
+            continue
+
+        if code in (Opcode.JMP, Opcode.IF):
+            found.add(arg)
+        if code == Opcode.CALL and prev is not None and prev[0] == Opcode.PUSHI:
+            found.add(prev[1])
+        if code in EXIT_OPS:
+            found.add(next_pc)
+
+        prev = (code, arg)
+        pc = next_pc
+
+    return frozenset(found)
+
+# returns a (handler, arg, next_pc) entry for the block at pc, or None if the
+# op there cannot start one
+def block_at(machine, pc):
+    end = pc
+    count = 0
+    while end < machine.code_end and count < MAX_BLOCK:
+        if count and end in machine.block_leaders:
+            break
+
+        try:
+            code, _, next_pc = machine._decode_op(end)
+        except MachineFault:
+            break
+
+        if next_pc > machine.code_end:
+            break
+        if code not in STRAIGHT_OPS and code not in EXIT_OPS:
+            break
+
+        end = next_pc
+        count += 1
+        if code in EXIT_OPS:
+            break
+
+    if not count:
+        return None
+
+    handler = compile_block(pc, bytes(machine.memory[pc:end]))
+    return handler.__get__(machine), None, end
+
+@lru_cache(maxsize=4096)
+def block_code(start, code):
+    return compile(block_source(start, code), f"<block {start:#06x}>", "exec")
+
+@lru_cache(maxsize=4096)
+def compile_block(start, code):
+    return load_block(block_code(start, code))
+
+# turns the module code from block_code into the block function
+def load_block(module_code):
+    namespace = {
+        "fwm": fwm,
+        "StopExecution": _stop_execution(),
+        "HALTED": RunStatus.HALTED,
+    }
+    exec(module_code, namespace)
+    return namespace["block"]
+
+def _stop_execution():
+    # imported late, stack_machine imports this module
+    from .stack_machine import StopExecution
+    return StopExecution
+
+def decode_block(start, code):
+    ops = []
+    offset = 0
+    while offset < len(code):
+        op = int.from_bytes(code[offset:offset + DWORD], "little") & 0xff
+        offset += DWORD
+        arg = None
+        if op in (Opcode.PUSHI, Opcode.JMP, Opcode.IF):
+            arg = int.from_bytes(code[offset:offset + DWORD], "little")
+            offset += DWORD
+
+        ops.append((op, arg, start + offset))
+
+    return ops
+
+def block_source(start, code):
+    return _BlockWriter(start, decode_block(start, code)).source()
+
+class _BlockWriter:
+    def __init__(self, start, ops):
+        self.start = start
+        self.ops = ops
+        self.lines = []
+        # values pushed by the block, deepest first, as source expressions
+        self.stack = []
+        # machine stack slots popped so far, and the deepest one read
+        self.under = 0
+        self.reads = 0
+        # lowest sp reached, in slots relative to the entry sp
+        self.depth = 0
+        self.loaded = {}
+        self.temps = 0
+        self.flag_value = None
+        self.flag_alu = None
+
+    def source(self):
+        body = self._body()
+        lines = [
+            "def block(m, arg, pc):",
+            "    sp = m.sp",
+            f"    if sp & 3 or sp - {self.depth * DWORD} < m.code_end"
+            f" or sp + {self.reads * DWORD} > len(m.memory):",
+            f"        return m._step({self.start})",
+            "    w = m.words",
+            "    b = sp >> 2",
+        ]
+        lines.extend("    " + line for line in self.lines + body)
+        return "\n".join(lines) + "\n"
+
+    def _body(self):
+        for n, (op, arg, next_pc) in enumerate(self.ops):
+            leave = self._op(op, arg, next_pc)
+            if leave is not None:
+                break
+        else:
+            leave = [f"return {next_pc}"]
+
+        # the run loop counts the dispatch itself
+        tail = self._flush()
+        if n:
+            tail.append(f"m.steps += {n}")
+
+        return tail + leave
+
+    def _temp(self, expr):
+        name = f"t{self.temps}"
+        self.temps += 1
+        self.lines.append(f"{name} = {expr}")
+        return name
+
+    def _load(self, slot):
+        self.reads = max(self.reads, slot + 1)
+        name = self.loaded.get(slot)
+        if name is None:
+            name = self._temp(f"w[b + {slot}]")
+            self.loaded[slot] = name
+
+        return name
+
+    def _push(self, expr):
+        self.stack.append(expr)
+        self.depth = max(self.depth, len(self.stack) - self.under)
+
+    def _pop(self):
+        if self.stack:
+            return self.stack.pop()
+
+        self.under += 1
+        return self._load(self.under - 1)
+
+    def _peek(self, n):
+        if n < len(self.stack):
+            return self.stack[-1 - n]
+
+        return self._load(self.under + n - len(self.stack))
+
+    def _alu(self, flags_op, a, b, symbol):
+        if isinstance(a, int) and isinstance(b, int):
+            result = FOLDS[symbol](a, b)
+        elif symbol in "+-":
+            result = self._temp(f"({a} {symbol} {b}) & 0xffffffff")
+        else:
+            result = self._temp(f"{a} {symbol} {b}")
+
+        self._push(result)
+        self.flag_value = result
+        if flags_op is not None:
+            self.flag_alu = (flags_op, a, b)
+
+    def _op(self, op, arg, next_pc):
+        if op == Opcode.PUSHI:
+            self._push(arg)
+            self.flag_value = arg
+        elif op == Opcode.DROPI:
+            if self.stack:
+                self.stack.pop()
+            else:
+                # never read, but still bounds checked on entry
+                self.under += 1
+                self.reads = max(self.reads, self.under)
+        elif op == Opcode.ADDI:
+            b = self._pop()
+            a = self._pop()
+            self._alu("fwm.add_dword_flags", a, b, "+")
+        elif op == Opcode.SUBI:
+            b = self._pop()
+            a = self._pop()
+            self._alu("fwm.sub_dword_flags", a, b, "-")
+        elif op == Opcode.ANDI:
+            b = self._pop()
+            a = self._pop()
+            self._alu(None, b, a, "&")
+        elif op == Opcode.ORI:
+            b = self._pop()
+            a = self._pop()
+            self._alu(None, b, a, "|")
+        elif op == Opcode.XORI:
+            b = self._pop()
+            a = self._pop()
+            self._alu(None, b, a, "^")
+        elif op == Opcode.DUPI:
+            value = self._peek(0)
+            self._push(value)
+            self.flag_value = value
+        elif op == Opcode.OVERI:
+            value = self._peek(1)
+            self._push(value)
+            self.flag_value = value
+        elif op == Opcode.SWAPI:
+            b = self._pop()
+            a = self._pop()
+            self._push(b)
+            self._push(a)
+            self.flag_value = a
+        elif op == Opcode.JMP:
+            return [f"return {arg}"]
+        elif op == Opcode.IF:
+            cond = self._pop()
+            if isinstance(cond, int):
+                return [f"return {arg if cond == 0 else next_pc}"]
+
+            return [f"if {cond} == 0:", f"    return {arg}", f"return {next_pc}"]
+        elif op == Opcode.CALL:
+            target = self._pop()
+            self._push(next_pc)
+            return [f"return {target}"]
+        elif op == Opcode.RET:
+            return [f"return {self._pop()}"]
+        elif op == Opcode.HALT:
+            return [f"raise StopExecution(HALTED, {next_pc})"]
+
+        return None
+
+    # writes the block's stack back to memory and sets sp and the flags
+    def _flush(self):
+        lines = []
+        top = self.under - len(self.stack)
+        for n, expr in enumerate(reversed(self.stack)):
+            slot = top + n
+            if self.loaded.get(slot) == expr:
+                # already in place
+                continue
+
+            lines.append(f"w[b + {slot}] = {expr}" if slot >= 0
+                         else f"w[b - {-slot}] = {expr}")
+
+        if top > 0:
+            lines.append(f"m.sp = sp + {top * DWORD}")
+        elif top < 0:
+            lines.append(f"m.sp = sp - {-top * DWORD}")
+        if self.flag_value is not None:
+            lines.append(f"m._flag_value = {self.flag_value}")
+        if self.flag_alu is not None:
+            lines.append("m._flag_alu = ({}, {}, {})".format(*self.flag_alu))
+
+        return lines
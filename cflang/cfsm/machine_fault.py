@@ -0,0 +1,17 @@
+class MachineFault(Exception): pass
+
+class InvalidOpcodeError(MachineFault):
+    def __init__(self, opcode, offset):
+        super().__init__(f'Invalid opcode [{hex(opcode)}] at location {hex(offset)}')
+        self.opcode = opcode
+        self.offset = offset
+
+class MemoryAccessError(MachineFault):
+    def __init__(self, address):
+        super().__init__(f'Memory access out of range at address {hex(address)}')
+        self.address = address
+
+class CodeWriteError(MachineFault):
+    def __init__(self, address):
+        super().__init__(f'Write into shared code at address {hex(address)}')
+        self.address = address
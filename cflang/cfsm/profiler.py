@@ -0,0 +1,92 @@
+from collections import Counter
+from .opcode import Opcode
+from .data_size import DWORD
+
+class Profiler:
+    def __init__(self):
+        self.machine = None
+        self.op_counts = Counter()
+        self.pc_counts = Counter()
+        self.call_counts = Counter()
+        self.folded = Counter()
+        self.max_depth = 0
+        self.frames = []
+        self.frame_key = ""
+
+    def attach(self, machine):
+        self.machine = machine
+        self.frames = [f"{machine.pc:#06x}"]
+        self.frame_key = self.frames[0]
+        machine.instrument(self.wrap)
+
+    def detach(self):
+        self.machine.uninstrument(self.wrap)
+        self.machine = None
+
+    def wrap(self, code, handler):
+        machine = self.machine
+        size = 2 * DWORD if code in machine.immediate_ops else DWORD
+        op_counts = self.op_counts
+        pc_counts = self.pc_counts
+        folded = self.folded
+
+        def profiled(arg, pc):
+            op_counts[code] += 1
+            pc_counts[pc - size] += 1
+            folded[self.frame_key] += 1
+            next_pc = handler(arg, pc)
+            depth = machine.empty_sp - machine.sp
+            if depth > self.max_depth:
+                self.max_depth = depth
+            return next_pc
+
+        if code == Opcode.CALL:
+            def profiled_call(arg, pc):
+                target = profiled(arg, pc)
+                self.call_counts[target] += 1
+                self._enter(target)
+                return target
+
+            return profiled_call
+
+        if code == Opcode.RET:
+            def profiled_ret(arg, pc):
+                next_pc = profiled(arg, pc)
+                self._leave()
+                return next_pc
+
+            return profiled_ret
+
+        return profiled
+
+    def _enter(self, target):
+        self.frames.append(f"{target:#06x}")
+        self.frame_key = ";".join(self.frames)
+
+    def _leave(self):
+        # a ret from the entry frame has nowhere to return to in the profile
+        if len(self.frames) > 1:
+            self.frames.pop()
+            self.frame_key = ";".join(self.frames)
+
+    def report(self, n=10):
+        lines = ["ops:"]
+        lines.extend(
+            f"{count:>10} {Opcode(code).name}"
+            for code, count in self.op_counts.most_common())
+        lines.append("hot pcs:")
+        lines.extend(
+            f"{count:>10} {pc:#06x}"
+            for pc, count in self.pc_counts.most_common(n))
+        lines.append("call targets:")
+        lines.extend(
+            f"{count:>10} {target:#06x}"
+            for target, count in self.call_counts.most_common(n))
+        lines.append(f"max stack depth: {self.max_depth}")
+        return "\n".join(lines)
+
+    # one "frame;frame count" line per stack, as consumed by flamegraph tools
+    def folded_stacks(self):
+        return "\n".join(
+            f"{stack} {count}"
+            for stack, count in sorted(self.folded.items()))
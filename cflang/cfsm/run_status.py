@@ -0,0 +1,8 @@
+from enum import Enum
+
+class RunStatus(Enum):
+    READY = 0
+    HALTED = 1
+    BUDGET_EXHAUSTED = 2
+    FAULT = 3
+    BREAK = 4
@@ -0,0 +1,101 @@
+from dataclasses import dataclass, field
+from .run_status import RunStatus
+
+PAGE_SIZE = 0x1000
+
+ZERO_PAGE = bytes(PAGE_SIZE)
+
+# splits memory into immutable pages. a page that matches the same page of
+# base is shared rather than copied, as are all zero pages, so snapshots
+# taken along one line of execution only hold the pages that changed
+def take_pages(memory, base=None):
+    view = memoryview(memory)
+    pages = []
+    for n, start in enumerate(range(0, len(view), PAGE_SIZE)):
+        chunk = view[start:start + PAGE_SIZE]
+        base_page = base[n] if base is not None and n < len(base) else None
+        if base_page is not None and chunk == base_page:
+            pages.append(base_page)
+        elif chunk == ZERO_PAGE[:len(chunk)]:
+            pages.append(ZERO_PAGE if len(chunk) == PAGE_SIZE else bytes(chunk))
+        else:
+            pages.append(bytes(chunk))
+
+    view.release()
+    return tuple(pages)
+
+# the machine's decode table with its handlers unbound, for forks to bind as
+# they reach each entry. None when the table holds instrumented handlers
+def unbound_decoded(machine):
+    if not machine.predecode or machine.instruments:
+        return None
+
+    decoded = dict(machine.shared_decoded or ())
+    traps = machine.traps
+    for pc, (handler, arg, next_pc) in machine.decoded.items():
+        if pc not in traps:
+            decoded[pc] = (handler.__func__, arg, next_pc)
+
+    return decoded
+
+@dataclass(frozen=True)
+class Snapshot:
+    mem_size: int
+    pages: tuple
+    code_end: int
+    pc: int
+    sp: int
+    bp: int
+    empty_sp: int
+    stop: bool
+    status: RunStatus
+    steps: int
+    flag_value: int
+    flag_alu: tuple
+    predecode: bool
+    fuse: bool
+    jit: bool = False
+    fault: Exception = None
+    # shared by every fork and never changed
+    decoded: dict = field(default=None, compare=False)
+    block_leaders: frozenset = field(default=frozenset(), compare=False)
+
+    @classmethod
+    def capture(cls, machine):
+        return cls(
+            mem_size=machine.mem_size,
+            pages=take_pages(machine.memory, machine.base_pages),
+            code_end=machine.code_end,
+            pc=machine.pc,
+            sp=machine.sp,
+            bp=machine.bp,
+            empty_sp=machine.empty_sp,
+            stop=machine.stop,
+            status=machine.status,
+            steps=machine.steps,
+            flag_value=machine._flag_value,
+            flag_alu=machine._flag_alu,
+            predecode=machine.predecode,
+            fuse=machine.fuse,
+            jit=machine.jit,
+            fault=machine.fault,
+            decoded=unbound_decoded(machine),
+            block_leaders=machine.block_leaders)
+
+    def restore(self, machine):
+        machine.reader = None
+        machine.mem_size = self.mem_size
+        # the one bulk copy, making the pages writable for the new machine
+        machine.memory = bytearray(b"".join(self.pages))
+        machine.base_pages = self.pages
+        machine.code_end = self.code_end
+        machine.pc = self.pc
+        machine.sp = self.sp
+        machine.bp = self.bp
+        machine.empty_sp = self.empty_sp
+        machine.stop = self.stop
+        machine.status = self.status
+        machine.fault = self.fault
+        machine.steps = self.steps
+        machine._flag_value = self.flag_value
+        machine._flag_alu = self.flag_alu
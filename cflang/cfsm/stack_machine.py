@@ -1,15 +1,71 @@
-from cflang.io.binary_reader import EndOfFileBinaryReader
+import struct
+import sys
 from .opcode import Opcode
+from .machine_fault import MachineFault, InvalidOpcodeError, MemoryAccessError
+from .run_status import RunStatus
 from .bit_ops import top_bit_mask
 from .data_size import DWORD
 from . import fixed_width_math as fwm
-from .flag_result import ZERO, CARRY, OVERFLOW, NEGATIVE, ALL_FLAGS
-
-class InvalidOpcodeError(Exception):
-    def __init__(self, opcode, offset):
-        super().__init__(f'Invalid opcode [{hex(opcode)}] at location {hex(offset)}')
-        self.opcode = opcode
-        self.offset = offset
+from . import fusion
+from . import jit as block_jit
+from .snapshot import Snapshot
+from .flag_result import OVERFLOW, CARRY
+
+# raised by handlers to leave the run loop, pc is where execution resumes.
+# executed is False when the op at pc was not run, as for a breakpoint
+class StopExecution(Exception):
+    def __init__(self, status, pc, executed=True):
+        super().__init__()
+        self.status = status
+        self.pc = pc
+        self.executed = executed
+
+DWORD_STRUCT = struct.Struct('<I')
+DWORD_MASK = (1 << 8 * DWORD) - 1
+DWORD_SIGN = top_bit_mask(DWORD)
+
+# register ids carried in the top byte of PUSHR/POPR
+REG_SP = 0
+REG_BP = 1
+REG_PC = 2
+
+class StructWordView:
+    def __init__(self, memory):
+        self.memory = memory
+
+    def __getitem__(self, index):
+        return DWORD_STRUCT.unpack_from(self.memory, index * DWORD)[0]
+
+    def __setitem__(self, index, n):
+        DWORD_STRUCT.pack_into(self.memory, index * DWORD, n)
+
+def word_view(memory):
+    # a native word cast only matches the little endian layout of the image
+    # on little endian hosts, otherwise fall back to struct access
+    if (sys.byteorder == 'little'
+            and struct.calcsize('I') == DWORD
+            and len(memory) % DWORD == 0):
+        return memoryview(memory).cast('I')
+
+    return StructWordView(memory)
+
+# length of the image once trailing zero padding is dropped, found without
+# copying so a mapped image is only read, never duplicated
+def image_extent(memory, page_size=0x1000):
+    view = memoryview(memory)
+    zero_page = bytes(page_size)
+    end = len(view)
+    while end > 0:
+        start = max(0, end - page_size)
+        if view[start:end] != zero_page[:end - start]:
+            break
+        end = start
+
+    while end > 0 and not view[end - 1]:
+        end -= 1
+
+    view.release()
+    return end
 
 class WrapAroundAdder:
     def __init__(self, range):
@@ -28,218 +84,538 @@ class WrapAroundAdder:
         return n % self.range
 
 class StackMachine:
-    def __init__(self, reader, mem_size=0x10000):
+    def __init__(self, reader, mem_size=0x10000, predecode=False, fuse=False,
+                 map_image=False, jit=False, decode_cache=None):
         self.reader = reader
         self.mem_size = mem_size
-        self.memory = [0] * self.mem_size
-        self.reader.read_bytes(self.memory)
-        self.op = 0
+        self.memory, self.code_end = self._load_image(map_image)
+        self.base_pages = None
         self.pc = 0
         self.bp = 0
         self.sp = mem_size - DWORD
         self.empty_sp = self.sp
         self.stop = False
-        self.overflow = False
-        self.zero = True
-        self.carry = False
-        self.negative = False
+        self.status = RunStatus.READY
+        self.fault = None
+        self.steps = 0
+        # flags are derived on demand from the last value that set them and
+        # the operands of the last add/sub
+        self._flag_value = 0
+        self._flag_alu = None
+        self._init_dispatch(predecode, fuse, jit, decode_cache)
+
+    def _init_dispatch(self, predecode, fuse, jit=False, decode_cache=None,
+                       snapshot=None):
+        self.words = word_view(self.memory)
+        # fused entries and compiled blocks only live in the decode table
+        self.predecode = predecode or fuse or jit
+        self.fuse = fuse
+        self.jit = jit
+        # the most ops a single dispatch can run
+        if jit:
+            self.entry_ops = block_jit.MAX_BLOCK
+        else:
+            self.entry_ops = fusion.MAX_FUSION if fuse else 1
+        self.instruments = []
+        self.dispatch = self._bind_handlers()
+        self.fused = fusion.bind_fusions(self)
+        self.decoded = {}
+        # pc -> breakpoint entry, kept in decoded over any decoded op
+        self.traps = {}
+        # word index -> starts of the compiled blocks covering it
+        self.block_owners = {}
+        # pc -> unbound entry of the snapshot this machine was forked from,
+        # bound into decoded when first reached and copied before any change
+        self.shared_decoded = None
+        if snapshot is not None and snapshot.decoded is not None:
+            self.shared_decoded = snapshot.decoded
+            self.block_leaders = snapshot.block_leaders
+            return
 
-    def run(self):
-        while not self.stop:
-            self.tick()
+        self.block_leaders = block_jit.leaders(self) if jit else frozenset()
+        if self.predecode:
+            # a cached table for the same image and options replaces decoding
+            if decode_cache is None or not decode_cache.load(self):
+                self._predecode()
+                if decode_cache is not None:
+                    decode_cache.store(self)
+
+    # captures registers, flags and memory. pages unchanged since the snapshot
+    # this machine was forked from (or last took) are shared, not copied
+    def snapshot(self):
+        snapshot = Snapshot.capture(self)
+        self.base_pages = snapshot.pages
+        return snapshot
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        machine = cls.__new__(cls)
+        snapshot.restore(machine)
+        machine._init_dispatch(snapshot.predecode, snapshot.fuse, snapshot.jit,
+                               snapshot=snapshot)
+        return machine
+
+    def run(self, max_steps=None):
+        status = self.run_for(max_steps)
+        if status == RunStatus.FAULT:
+            raise self.fault
 
         return self._read_dword_mem(self.sp)
 
-    def tick(self):
+    def run_for(self, steps=None):
         if self.stop:
-            return
-
-        curr_pc = self.pc
+            return self.status
+
+        decoded = self.decoded
+        decode = self._decode_at
+        interval = StackMachine.budget_interval
+        # fused entries and compiled blocks run several ops per dispatch and
+        # count the extra ones into steps themselves, so the budget is charged
+        # what steps moved by and only as many dispatches are made as cannot
+        # overrun it
+        entry_ops = self.entry_ops
+        remaining = steps
+        pc = self.pc
         try:
-            self.op = self._read_dword_pc()
-            op = self.op & 0xff
-            handler = StackMachine.handlers[op]
-            handler(self)
-        except EndOfFileBinaryReader:
-            self.stop = True
-        except KeyError:
-            raise InvalidOpcodeError(opcode=op, offset=curr_pc)
-
-    def _set_flags(self, overflow=None, zero=None, carry=None, negative=None):
-        if overflow is not None:
-            self.overflow = overflow
-
-        if zero is not None:
-            self.zero = zero
-
-        if carry is not None:
-            self.carry = carry
-
-        if negative is not None:
-            self.negative = negative
-
-    def _set_flags_for_dword(self, n):
-        mask = top_bit_mask(DWORD)
-        negative = True if n & mask else False
-        zero = not bool(n)
-        self._set_flags(negative=negative, zero=zero)
-
-    def _read_dword_pc(self):
-        i = self._read_dword_mem(self.pc)
-        self.pc += DWORD
-        return i
+            while remaining is None or remaining > 0:
+                if remaining is None:
+                    chunk = interval
+                else:
+                    chunk = min(interval, remaining // entry_ops)
+
+                if not chunk:
+                    # too little left for a whole entry, finish op by op
+                    traps = self.traps
+                    for n in range(remaining):
+                        entry = traps.get(pc) or self._decode(pc)
+                        pc = entry[0](entry[1], entry[2])
+
+                    self.steps += remaining
+                    break
+
+                start = self.steps
+                for n in range(chunk):
+                    # pc is only reassigned once the handler returns, so it
+                    # still names the current instruction if anything raises
+                    entry = decoded.get(pc) or decode(pc)
+                    pc = entry[0](entry[1], entry[2])
+
+                self.steps += chunk
+                if remaining is not None:
+                    remaining -= self.steps - start
+
+            self.status = RunStatus.BUDGET_EXHAUSTED
+        except StopExecution as stop:
+            self.steps += n + 1 if stop.executed else n
+            pc = stop.pc
+            # a break can be resumed, anything else ends the run
+            self.stop = stop.status != RunStatus.BREAK
+            self.status = stop.status
+        except MachineFault as err:
+            self._fault(err, n)
+        except fusion.FusedFault as fused:
+            self._fault(fused.fault, n + fused.executed)
+            pc = fused.pc
+        finally:
+            self.pc = pc
+
+        return self.status
+
+    def tick(self):
+        if self.run_for(1) == RunStatus.FAULT:
+            raise self.fault
+
+    def _fault(self, err, executed):
+        self.steps += executed
+        self.stop = True
+        self.status = RunStatus.FAULT
+        self.fault = err
+
+    # wrap(code, handler) returns the handler to dispatch to for an op. the
+    # wrapped table replaces the plain one, so an uninstrumented machine pays
+    # nothing, and fusion is bypassed while any instrument is installed
+    def instrument(self, wrap):
+        self.instruments.append(wrap)
+        self._rebuild_dispatch()
+
+    def uninstrument(self, wrap):
+        self.instruments.remove(wrap)
+        self._rebuild_dispatch()
+
+    def _rebuild_dispatch(self):
+        dispatch = self._bind_handlers()
+        for wrap in self.instruments:
+            dispatch = {
+                code: wrap(code, handler)
+                for code, handler in dispatch.items()
+            }
+
+        self.dispatch = dispatch
+        self.decoded = {}
+        self.shared_decoded = None
+        if self.predecode:
+            self._predecode()
+
+        self.decoded.update(self.traps)
+
+    def _load_image(self, map_image):
+        # memory is one buffer under a single word view, and a file can only
+        # be mapped up to its own length, so only an image file at least
+        # mem_size long is mapped. a shorter one is copied, which reads only
+        # the image's own bytes into otherwise untouched zero memory
+        if map_image:
+            # readers that can map their image hand back copy on write memory
+            provider = getattr(self.reader, 'provider', None)
+            if hasattr(provider, 'map_image'):
+                memory = provider.map_image(self.mem_size)
+                if memory is not None:
+                    # round up so a trailing op with zero high bytes is covered
+                    extent = -(-image_extent(memory) // DWORD) * DWORD
+                    return memory, min(extent, self.mem_size)
+
+        memory = bytearray(self.mem_size)
+        return memory, self.reader.read_bytes(memory)
+
+    def _bind_handlers(self):
+        return {
+            int(op): handler.__get__(self)
+            for op, handler in StackMachine.handlers.items()
+        }
+
+    # decoded entries are (bound handler, arg, next_pc), where arg is the
+    # immediate for ops that take one, otherwise the top byte of the op
+    def _decode_op(self, pc):
+        op = self._read_dword_mem(pc)
+        code = op & 0xff
+        if code not in self.dispatch:
+            raise InvalidOpcodeError(opcode=code, offset=pc)
+
+        if code in StackMachine.immediate_ops:
+            return code, self._read_dword_mem(pc + DWORD), pc + 2 * DWORD
+
+        return code, op >> 24, pc + DWORD
+
+    def _decode(self, pc):
+        code, arg, next_pc = self._decode_op(pc)
+        return self.dispatch[code], arg, next_pc
+
+    def _decode_at(self, pc):
+        entry = None
+        if self.shared_decoded is not None:
+            entry = self._bind_shared(pc)
+
+        if entry is None and self.jit and not self.instruments:
+            entry = block_jit.block_at(self, pc)
+            if entry is not None:
+                self._own_block(pc, entry[2])
+
+        if entry is None and self.fuse and not self.instruments:
+            entry = fusion.fuse_at(self, pc)
+
+        if entry is None:
+            entry = self._decode(pc)
+
+        # only entries fully inside the loaded image are tracked for invalidation
+        if self.predecode and entry[2] <= self.code_end:
+            self.decoded[pc] = entry
+
+        return entry
+
+    def _bind_shared(self, pc):
+        record = self.shared_decoded.get(pc)
+        if record is None:
+            return None
+
+        func, arg, next_pc = record
+        if func.__name__ == "block":
+            self._own_block(pc, next_pc)
+
+        return func.__get__(self), arg, next_pc
+
+    # binds every shared entry not yet reached, so invalidation only has to
+    # deal with this machine's own table
+    def _unshare(self):
+        decoded = self.decoded
+        for pc in self.shared_decoded:
+            if pc not in decoded:
+                decoded[pc] = self._bind_shared(pc)
+
+        self.shared_decoded = None
+
+    def _own_block(self, start, end):
+        owners = self.block_owners
+        for word in range(start >> 2, (end - 1 >> 2) + 1):
+            owners.setdefault(word, set()).add(start)
+
+    # runs the single op at pc through its plain handler
+    def _step(self, pc):
+        handler, arg, next_pc = self._decode(pc)
+        return handler(arg, next_pc)
+
+    def _predecode(self):
+        pcs = range(0, self.code_end - DWORD + 1, DWORD)
+        if self.jit and not self.instruments:
+            # blocks from every other pc are compiled if they are ever reached
+            pcs = sorted(pc for pc in self.block_leaders if pc in pcs)
+
+        for pc in pcs:
+            try:
+                self._decode_at(pc)
+            except InvalidOpcodeError:
+                # data in the image, decoded (and rejected) if it is ever reached
+                pass
+
+    def _invalidate(self, loc):
+        if self.shared_decoded is not None:
+            self._unshare()
+
+        decoded = self.decoded
+        for pc in range(max(0, loc - StackMachine.decoded_span + 1), loc + DWORD):
+            decoded.pop(pc, None)
+
+        owners = self.block_owners
+        if owners:
+            for word in (loc >> 2, loc + DWORD - 1 >> 2):
+                for start in owners.pop(word, ()):
+                    decoded.pop(start, None)
+
+        traps = self.traps
+        if traps:
+            for pc in range(max(0, loc - StackMachine.decoded_span + 1), loc + DWORD):
+                if pc in traps:
+                    decoded[pc] = traps[pc]
+
+    @property
+    def zero(self):
+        return not self._flag_value
+
+    @property
+    def negative(self):
+        return True if self._flag_value & DWORD_SIGN else False
+
+    @property
+    def carry(self):
+        return True if self._alu_flags() & CARRY else False
+
+    @property
+    def overflow(self):
+        return True if self._alu_flags() & OVERFLOW else False
+
+    def _alu_flags(self):
+        if self._flag_alu is None:
+            return 0
+
+        flags_op, arg1, arg2 = self._flag_alu
+        return flags_op(arg1, arg2)
 
     def _read_dword_mem(self, loc):
-        i = int.from_bytes(
-            bytearray(self.memory[loc + n] for n in range(DWORD)),
-            byteorder="little")
-        return i
+        try:
+            if loc & 3:
+                return DWORD_STRUCT.unpack_from(self.memory, loc)[0]
+
+            return self.words[loc >> 2]
+        except (IndexError, struct.error):
+            raise MemoryAccessError(address=loc) from None
 
     def _write_dword_mem(self, loc, n):
-        encoded = n.to_bytes(length=DWORD, byteorder="little")
-        for n, b in enumerate(encoded):
-            self.memory[loc + n] = b
-
-    def _push_dword_reg(self, reg, n):
-        addr = getattr(self, reg)
-        addr, _ = fwm.sub(DWORD, addr, DWORD)
-        setattr(self, reg, addr)
-        self._write_dword_mem(addr, n)
-
-    def _pop_dword_reg(self, reg):
-        addr = getattr(self, reg)
-        n = self._read_dword_mem(addr)
-        addr, _ = fwm.add(DWORD, addr, DWORD)
-        setattr(self, reg, addr)
-        return n
+        # without predecoding only breakpoints are in decoded, and they stay
+        if self.predecode and loc < self.code_end:
+            self._invalidate(loc)
 
+        try:
+            if loc & 3:
+                DWORD_STRUCT.pack_into(self.memory, loc, n)
+            else:
+                self.words[loc >> 2] = n
+        except (IndexError, struct.error):
+            raise MemoryAccessError(address=loc) from None
+
+    # sp wraps at DWORD_MASK like WrapAroundAdder(1 << 32), and is stored
+    # back at the same points as a separate pop or push would, so a fault
+    # leaves it where the unoptimised ops did
     def _push_dword_sp(self, n):
-        self._push_dword_reg('sp', n)
+        sp = (self.sp - DWORD) & DWORD_MASK
+        self.sp = sp
+        if sp & 3 or sp < self.code_end:
+            self._write_dword_mem(sp, n)
+            return
+
+        try:
+            self.words[sp >> 2] = n
+        except (IndexError, struct.error):
+            raise MemoryAccessError(address=sp) from None
 
     def _pop_dword_sp(self):
-        return self._pop_dword_reg('sp')
+        sp = self.sp
+        if sp & 3:
+            n = self._read_dword_mem(sp)
+        else:
+            try:
+                n = self.words[sp >> 2]
+            except (IndexError, struct.error):
+                raise MemoryAccessError(address=sp) from None
+
+        self.sp = (sp + DWORD) & DWORD_MASK
+        return n
+
+    # pops the top two entries, returned as (second, top)
+    def _pop_pair_sp(self):
+        sp = self.sp
+        top = self._read_dword_mem(sp)
+        try:
+            second = self._read_dword_mem(sp + DWORD)
+        except MemoryAccessError:
+            self.sp = (sp + DWORD) & DWORD_MASK
+            raise
+
+        self.sp = (sp + 2 * DWORD) & DWORD_MASK
+        return second, top
 
-    def _pushi(self):
-        arg = self._read_dword_pc()
+    # handlers receive the decoded arg and the address of the next
+    # instruction, and return the address to continue from
+
+    def _pushi(self, arg, pc):
         self._push_dword_sp(arg)
-        self._set_flags_for_dword(arg)
+        self._flag_value = arg
+        return pc
 
-    def _dropi(self):
+    def _dropi(self, arg, pc):
         self._pop_dword_sp()
+        return pc
+
+    # register ids are REG_SP, REG_BP and REG_PC
+    def _pushr(self, arg, pc):
+        if arg == REG_SP:
+            arg = self.sp
+        elif arg == REG_BP:
+            arg = self.bp
+        elif arg == REG_PC:
+            arg = pc
+        else:
+            raise InvalidOpcodeError(opcode=Opcode.PUSHR, offset=pc - DWORD)
 
-    def _get_reg_from_op(self):
-        reg_id = (self.op & 0xff000000) >> 24
-        return self.registers[reg_id]
+        self._push_dword_sp(arg)
+        self._flag_value = arg
+        return pc
 
-    def _pushr(self):
-        reg = self._get_reg_from_op()
+    def _popr(self, arg, pc):
+        if arg not in (REG_SP, REG_BP, REG_PC):
+            raise InvalidOpcodeError(opcode=Opcode.POPR, offset=pc - DWORD)
 
-        arg = getattr(self, reg)
-        self._push_dword_sp(arg)
-        self._set_flags_for_dword(arg)
+        value = self._pop_dword_sp()
+        self._flag_value = value
+        if arg == REG_PC:
+            return value
 
-    def _popr(self):
-        reg = self._get_reg_from_op()
+        if arg == REG_SP:
+            self.sp = value
+        else:
+            self.bp = value
 
-        arg = self._pop_dword_sp()
-        self._set_flags_for_dword(arg)
-        setattr(self, reg, arg)
+        return pc
 
-    def _fetchi(self):
+    def _fetchi(self, arg, pc):
         loc = self._pop_dword_sp()
         arg = self._read_dword_mem(loc)
         self._push_dword_sp(arg)
-        self._set_flags_for_dword(arg)
+        self._flag_value = arg
+        return pc
 
-    def _storei(self):
-        loc = self._pop_dword_sp()
-        arg = self._pop_dword_sp()
+    def _storei(self, arg, pc):
+        arg, loc = self._pop_pair_sp()
         self._write_dword_mem(loc, arg)
-        self._set_flags_for_dword(arg)
+        self._flag_value = arg
+        return pc
 
-    def _addi(self):
-        arg2 = self._pop_dword_sp()
-        arg1 = self._pop_dword_sp()
-        result, flags = fwm.add(DWORD, arg1, arg2)
-        self._set_flags(**flags.select(ALL_FLAGS))
+    def _addi(self, arg, pc):
+        arg1, arg2 = self._pop_pair_sp()
+        result = (arg1 + arg2) & DWORD_MASK
+        self._flag_value = result
+        self._flag_alu = (fwm.add_dword_flags, arg1, arg2)
 
         self._push_dword_sp(result)
+        return pc
 
-    def _subi(self):
-        arg2 = self._pop_dword_sp()
-        arg1 = self._pop_dword_sp()
-        result, flags = fwm.sub(DWORD, arg1, arg2)
-        self._set_flags(**flags.select(ALL_FLAGS))
+    def _subi(self, arg, pc):
+        arg1, arg2 = self._pop_pair_sp()
+        result = (arg1 - arg2) & DWORD_MASK
+        self._flag_value = result
+        self._flag_alu = (fwm.sub_dword_flags, arg1, arg2)
 
         self._push_dword_sp(result)
+        return pc
 
-    def _halt(self):
-        self.stop = True
+    def _halt(self, arg, pc):
+        raise StopExecution(RunStatus.HALTED, pc)
+
+    def _brk(self, arg, pc):
+        raise StopExecution(RunStatus.BREAK, pc)
 
-    def _ret(self):
-        self.pc = self._pop_dword_sp()
+    def _ret(self, arg, pc):
+        return self._pop_dword_sp()
 
-    def _andi(self):
-        arg2 = self._pop_dword_sp()
-        arg1 = self._pop_dword_sp()
+    def _andi(self, arg, pc):
+        arg1, arg2 = self._pop_pair_sp()
         result = arg2 & arg1
-        self._set_flags_for_dword(result)
+        self._flag_value = result
 
         self._push_dword_sp(result)
+        return pc
 
-    def _ori(self):
-        arg2 = self._pop_dword_sp()
-        arg1 = self._pop_dword_sp()
+    def _ori(self, arg, pc):
+        arg1, arg2 = self._pop_pair_sp()
         result = arg2 | arg1
-        self._set_flags_for_dword(result)
+        self._flag_value = result
 
         self._push_dword_sp(result)
+        return pc
 
-    def _xori(self):
-        arg2 = self._pop_dword_sp()
-        arg1 = self._pop_dword_sp()
+    def _xori(self, arg, pc):
+        arg1, arg2 = self._pop_pair_sp()
         result = arg2 ^ arg1
-        self._set_flags_for_dword(result)
+        self._flag_value = result
 
         self._push_dword_sp(result)
+        return pc
 
-    def _dupi(self):
+    def _dupi(self, arg, pc):
         arg = self._read_dword_mem(self.sp)
         self._push_dword_sp(arg)
 
-        self._set_flags_for_dword(arg)
+        self._flag_value = arg
+        return pc
 
-    def _overi(self):
+    def _overi(self, arg, pc):
         arg = self._read_dword_mem(self.sp + DWORD)
         self._push_dword_sp(arg)
 
-        self._set_flags_for_dword(arg)
+        self._flag_value = arg
+        return pc
 
-    def _swapi(self):
-        arg2 = self._pop_dword_sp()
-        arg1 = self._pop_dword_sp()
+    def _swapi(self, arg, pc):
+        arg1, arg2 = self._pop_pair_sp()
         self._push_dword_sp(arg2)
         self._push_dword_sp(arg1)
 
-        self._set_flags_for_dword(arg1)
+        self._flag_value = arg1
+        return pc
 
-    def _jmp(self):
-        addr = self._read_dword_pc()
-        self.pc = addr
+    def _jmp(self, arg, pc):
+        return arg
 
-    def _if(self):
-        arg = self._pop_dword_sp()
-        addr = self._read_dword_pc()
-        if arg == 0:
-            self.pc = addr
+    def _if(self, arg, pc):
+        if self._pop_dword_sp() == 0:
+            return arg
 
-    def _call(self):
+        return pc
+
+    def _call(self, arg, pc):
         addr = self._pop_dword_sp()
-        self._push_dword_sp(self.pc)
-        self.pc = addr
+        self._push_dword_sp(pc)
+        return addr
 
-    def _nop(self):
-        pass
+    def _nop(self, arg, pc):
+        return pc
 
     handlers = {
         Opcode.PUSHI: _pushi,
@@ -260,12 +636,21 @@ class StackMachine:
         Opcode.IF: _if,
         Opcode.CALL: _call,
         Opcode.HALT: _halt,
+        Opcode.BRK: _brk,
         Opcode.PUSHR: _pushr,
         Opcode.POPR: _popr,
     }
 
-    registers = {
-        0: 'sp',
-        1: 'bp',
-        2: 'pc',
-    }
+    # ops followed by an immediate dword
+    immediate_ops = frozenset([
+        Opcode.PUSHI,
+        Opcode.JMP,
+        Opcode.IF,
+    ])
+
+    # instructions run between budget checks
+    budget_interval = 1024
+
+    # the most bytes a single decoded entry covers, compiled blocks aside
+    decoded_span = max(2 * DWORD, fusion.MAX_SPAN)
+
@@ -0,0 +1,119 @@
+import struct
+from collections import namedtuple
+from .opcode import Opcode
+from .data_size import DWORD
+from .flag_result import ZERO, NEGATIVE, OVERFLOW, CARRY
+from .stack_machine import DWORD_SIGN
+
+MAGIC = b"CFTR"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHH")
+
+# pc, opcode, flags, padding, arg, sp. sp and flags are as the op found them,
+# so the last record of a faulted run is the op that faulted
+RECORD = struct.Struct("<IBBxxII")
+
+TraceRecord = namedtuple("TraceRecord", "pc opcode flags arg sp")
+
+# records every executed op into a preallocated buffer of capacity records.
+# without a stream the buffer is a ring holding the most recent ops; with
+# one, each full buffer is written out and the trace holds every op
+class Tracer:
+    def __init__(self, capacity=1 << 16, stream=None):
+        self.capacity = capacity
+        self.stream = stream
+        self.buffer = bytearray(capacity * RECORD.size)
+        self.count = 0
+        self.machine = None
+
+    def attach(self, machine):
+        self.machine = machine
+        if self.stream is not None:
+            self.stream.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+
+        machine.instrument(self.wrap)
+
+    def detach(self):
+        self.machine.uninstrument(self.wrap)
+        self.machine = None
+        if self.stream is not None:
+            filled = self.count % self.capacity
+            self.stream.write(self.buffer[:filled * RECORD.size])
+            self.stream.flush()
+
+    def wrap(self, code, handler):
+        machine = self.machine
+        size = 2 * DWORD if code in machine.immediate_ops else DWORD
+        pack = RECORD.pack_into
+        buffer = self.buffer
+        capacity = self.capacity
+        stream = self.stream
+
+        def traced(arg, pc):
+            value = machine._flag_value
+            flags = machine._alu_flags()
+            if not value:
+                flags |= ZERO
+            if value & DWORD_SIGN:
+                flags |= NEGATIVE
+
+            slot = self.count % capacity
+            pack(buffer, slot * RECORD.size, pc - size, code, flags, arg, machine.sp)
+            self.count += 1
+            if stream is not None and slot == capacity - 1:
+                stream.write(buffer)
+
+            return handler(arg, pc)
+
+        return traced
+
+    # the buffered records, oldest first
+    def records(self):
+        if self.count <= self.capacity:
+            slots = range(self.count)
+        else:
+            start = self.count % self.capacity
+            slots = [(start + n) % self.capacity for n in range(self.capacity)]
+
+        return [
+            TraceRecord._make(RECORD.unpack_from(self.buffer, slot * RECORD.size))
+            for slot in slots
+        ]
+
+    # writes the buffered records as a trace file
+    def dump(self, path):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+            for record in self.records():
+                f.write(RECORD.pack(*record))
+
+def read_trace(path):
+    with open(path, "rb") as f:
+        magic, version, size = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or size != RECORD.size:
+            raise ValueError(f"{path} is not a version {VERSION} trace")
+
+        while True:
+            chunk = f.read(size * 4096)
+            if not chunk:
+                break
+
+            for fields in RECORD.iter_unpack(chunk):
+                yield TraceRecord._make(fields)
+
+def filter_trace(records, pcs=None, opcodes=None):
+    for record in records:
+        if pcs is not None and record.pc not in pcs:
+            continue
+        if opcodes is not None and record.opcode not in opcodes:
+            continue
+
+        yield record
+
+def format_record(record):
+    flags = "".join(
+        name if record.flags & bit else "-"
+        for name, bit in (("Z", ZERO), ("N", NEGATIVE), ("C", CARRY), ("V", OVERFLOW)))
+    return (f"{record.pc:#06x} {Opcode(record.opcode).name:<6}"
+            f" {record.arg:#010x} sp={record.sp:#06x} {flags}")
@@ -0,0 +1,363 @@
+import numpy as np
+from .opcode import Opcode
+from .data_size import DWORD
+from .machine_fault import MachineFault, InvalidOpcodeError, MemoryAccessError, CodeWriteError
+from .run_status import RunStatus
+from .stack_machine import StackMachine, DWORD_MASK, DWORD_SIGN, REG_SP, REG_BP, REG_PC
+
+# lane status while it is still executing, otherwise a RunStatus value
+RUNNING = -1
+
+ALU_NONE = 0
+ALU_ADD = 1
+ALU_SUB = 2
+
+BYTE_OFFSETS = np.arange(DWORD)
+
+# runs one program on many lanes in lockstep. each step runs the op at the
+# lowest pc any running lane is at, for every lane at that pc, so lanes that
+# diverge at an IF are masked out until the others reach them again.
+#
+# every lane shares the loaded image as its code: a lane that writes into it
+# faults with CodeWriteError and one that runs past it faults as an invalid
+# op. a lane stops at BRK with RunStatus.BREAK. registers of a faulted lane
+# are not meaningful beyond pc, which names the op that faulted
+class VectorStackMachine:
+    def __init__(self, reader, lanes, mem_size=0x10000):
+        # decodes ops from the pristine image, it is never run
+        self.image = StackMachine(reader, mem_size)
+        self.lanes = lanes
+        self.mem_size = mem_size
+        self.code_end = self.image.code_end
+        image = np.frombuffer(bytes(self.image.memory), dtype=np.uint8)
+        self.memory = np.tile(image, (lanes, 1))
+        self.words = self.memory.view('<u4')
+        self.pc = np.zeros(lanes, dtype=np.int64)
+        self.sp = np.full(lanes, mem_size - DWORD, dtype=np.int64)
+        self.bp = np.zeros(lanes, dtype=np.int64)
+        self.empty_sp = mem_size - DWORD
+        self.steps = np.zeros(lanes, dtype=np.int64)
+        self.status = np.full(lanes, RUNNING, dtype=np.int8)
+        self.faults = {}
+        self.flag_value = np.zeros(lanes, dtype=np.int64)
+        self.alu_op = np.zeros(lanes, dtype=np.int8)
+        self.alu_a = np.zeros(lanes, dtype=np.int64)
+        self.alu_b = np.zeros(lanes, dtype=np.int64)
+        self.decoded = {}
+
+    # pushes one value per lane, e.g. each lane's input
+    def push(self, values):
+        idx = np.arange(self.lanes)
+        sp = (self.sp - DWORD) & DWORD_MASK
+        self._put(idx, sp, np.asarray(values, dtype=np.int64) & DWORD_MASK)
+        self.sp = sp
+
+    def run(self, max_steps=None):
+        while True:
+            running = self.status == RUNNING
+            if max_steps is not None:
+                spent = running & (self.steps >= max_steps)
+                self.status[spent] = RunStatus.BUDGET_EXHAUSTED.value
+                running &= ~spent
+
+            if not running.any():
+                break
+
+            pc = self.pc[running].min()
+            self._execute(int(pc), np.flatnonzero(running & (self.pc == pc)))
+
+        return self.top()
+
+    # the top of each lane's stack, 0 where it cannot be read
+    def top(self):
+        values, ok = self._read(np.arange(self.lanes), self.sp)
+        return np.where(ok, values, 0)
+
+    def lane_status(self, lane):
+        code = int(self.status[lane])
+        return None if code == RUNNING else RunStatus(code)
+
+    @property
+    def zero(self):
+        return self.flag_value == 0
+
+    @property
+    def negative(self):
+        return (self.flag_value & DWORD_SIGN) != 0
+
+    @property
+    def carry(self):
+        a, b = self.alu_a, self.alu_b
+        return np.where(self.alu_op == ALU_ADD, a + b > DWORD_MASK,
+                        (self.alu_op == ALU_SUB) & (a < b))
+
+    @property
+    def overflow(self):
+        a, b = self.alu_a, self.alu_b
+        a_neg = (a & DWORD_SIGN) != 0
+        b_neg = (b & DWORD_SIGN) != 0
+        # the sign of the alu result, not of whatever value set the flags last
+        result = np.where(self.alu_op == ALU_ADD, a + b, a - b) & DWORD_MASK
+        result_neg = (result & DWORD_SIGN) != 0
+        add = result_neg & ~a_neg & ~b_neg
+        sub = ~result_neg & a_neg & ~b_neg
+        return np.where(self.alu_op == ALU_ADD, add, (self.alu_op == ALU_SUB) & sub)
+
+    def _decode(self, pc):
+        entry = self.decoded.get(pc)
+        if entry is None:
+            entry = self.image._decode_op(pc)
+            if entry[2] > self.code_end:
+                raise InvalidOpcodeError(opcode=entry[0], offset=pc)
+
+            self.decoded[pc] = entry
+
+        return entry
+
+    def _execute(self, pc, idx):
+        try:
+            code, arg, next_pc = self._decode(pc)
+        except MachineFault as err:
+            self._fault(idx, lambda lane: err)
+            return
+
+        VectorStackMachine.handlers[code](self, idx, arg, next_pc)
+
+    def _fault(self, lanes, make_fault):
+        self.status[lanes] = RunStatus.FAULT.value
+        for lane in lanes:
+            self.faults[int(lane)] = make_fault(lane)
+
+    def _fault_addresses(self, lanes, addrs, error):
+        self.status[lanes] = RunStatus.FAULT.value
+        for lane, addr in zip(lanes, addrs):
+            self.faults[int(lane)] = error(address=int(addr))
+
+    def _read(self, idx, addr):
+        ok = addr <= self.mem_size - DWORD
+        addr = np.where(ok, addr, 0)
+        if not (addr & 3).any():
+            return self.words[idx, addr >> 2].astype(np.int64), ok
+
+        parts = self.memory[idx[:, None], addr[:, None] + BYTE_OFFSETS].astype(np.int64)
+        return parts[:, 0] | parts[:, 1] << 8 | parts[:, 2] << 16 | parts[:, 3] << 24, ok
+
+    def _put(self, idx, addr, values):
+        if not (addr & 3).any():
+            self.words[idx, addr >> 2] = values
+        else:
+            shifted = values[:, None] >> (8 * BYTE_OFFSETS)
+            self.memory[idx[:, None], addr[:, None] + BYTE_OFFSETS] = shifted & 0xff
+
+    # reads count entries down from the top of each lane's stack, top first.
+    # lanes that cannot are faulted and dropped from the returned idx and sp
+    def _pop_values(self, idx, count):
+        sp = self.sp[idx]
+        values = []
+        for n in range(count):
+            addr = sp + n * DWORD
+            value, ok = self._read(idx, addr)
+            if not ok.all():
+                self._fault_addresses(idx[~ok], addr[~ok], MemoryAccessError)
+                idx, sp, value = idx[ok], sp[ok], value[ok]
+                values = [v[ok] for v in values]
+
+            values.append(value)
+
+        return idx, sp, values
+
+    # faults lanes whose write to any of addrs would leave memory or touch
+    # code, returning the mask of lanes that can write them all
+    def _check_writes(self, idx, *addrs):
+        keep = np.ones(len(idx), dtype=bool)
+        for addr in addrs:
+            outside = keep & (addr > self.mem_size - DWORD)
+            if outside.any():
+                self._fault_addresses(idx[outside], addr[outside], MemoryAccessError)
+                keep &= ~outside
+
+            code = keep & (addr < self.code_end)
+            if code.any():
+                self._fault_addresses(idx[code], addr[code], CodeWriteError)
+                keep &= ~code
+
+        return keep
+
+    def _advance(self, idx, pc):
+        self.pc[idx] = pc
+        self.steps[idx] += 1
+
+    def _push(self, idx, values, next_pc):
+        sp = (self.sp[idx] - DWORD) & DWORD_MASK
+        keep = self._check_writes(idx, sp)
+        idx, sp, values = idx[keep], sp[keep], values[keep]
+        self._put(idx, sp, values)
+        self.sp[idx] = sp
+        self.flag_value[idx] = values
+        self._advance(idx, next_pc)
+
+    def _binary(self, idx, next_pc, op, alu=ALU_NONE):
+        idx, sp, (b, a) = self._pop_values(idx, 2)
+        keep = self._check_writes(idx, sp + DWORD)
+        idx, sp, a, b = idx[keep], sp[keep], a[keep], b[keep]
+        result = op(a, b) & DWORD_MASK
+        self._put(idx, sp + DWORD, result)
+        self.sp[idx] = sp + DWORD
+        self.flag_value[idx] = result
+        if alu != ALU_NONE:
+            self.alu_op[idx] = alu
+            self.alu_a[idx] = a
+            self.alu_b[idx] = b
+
+        self._advance(idx, next_pc)
+
+    def _nop(self, idx, arg, next_pc):
+        self._advance(idx, next_pc)
+
+    def _pushi(self, idx, arg, next_pc):
+        self._push(idx, np.full(len(idx), arg, dtype=np.int64), next_pc)
+
+    def _addi(self, idx, arg, next_pc):
+        self._binary(idx, next_pc, np.add, ALU_ADD)
+
+    def _subi(self, idx, arg, next_pc):
+        self._binary(idx, next_pc, np.subtract, ALU_SUB)
+
+    def _andi(self, idx, arg, next_pc):
+        self._binary(idx, next_pc, np.bitwise_and)
+
+    def _ori(self, idx, arg, next_pc):
+        self._binary(idx, next_pc, np.bitwise_or)
+
+    def _xori(self, idx, arg, next_pc):
+        self._binary(idx, next_pc, np.bitwise_xor)
+
+    def _dropi(self, idx, arg, next_pc):
+        idx, sp, _ = self._pop_values(idx, 1)
+        self.sp[idx] = (sp + DWORD) & DWORD_MASK
+        self._advance(idx, next_pc)
+
+    def _dupi(self, idx, arg, next_pc):
+        idx, _, (value,) = self._pop_values(idx, 1)
+        self._push(idx, value, next_pc)
+
+    def _overi(self, idx, arg, next_pc):
+        idx, _, (_, value) = self._pop_values(idx, 2)
+        self._push(idx, value, next_pc)
+
+    def _swapi(self, idx, arg, next_pc):
+        idx, sp, (b, a) = self._pop_values(idx, 2)
+        keep = self._check_writes(idx, sp, sp + DWORD)
+        idx, sp, a, b = idx[keep], sp[keep], a[keep], b[keep]
+        self._put(idx, sp + DWORD, b)
+        self._put(idx, sp, a)
+        self.flag_value[idx] = a
+        self._advance(idx, next_pc)
+
+    def _storei(self, idx, arg, next_pc):
+        idx, sp, (loc, value) = self._pop_values(idx, 2)
+        keep = self._check_writes(idx, loc)
+        idx, sp, loc, value = idx[keep], sp[keep], loc[keep], value[keep]
+        self._put(idx, loc, value)
+        self.sp[idx] = (sp + 2 * DWORD) & DWORD_MASK
+        self.flag_value[idx] = value
+        self._advance(idx, next_pc)
+
+    def _fetchi(self, idx, arg, next_pc):
+        idx, sp, (loc,) = self._pop_values(idx, 1)
+        value, ok = self._read(idx, loc)
+        if not ok.all():
+            self._fault_addresses(idx[~ok], loc[~ok], MemoryAccessError)
+            idx, sp, value = idx[ok], sp[ok], value[ok]
+
+        keep = self._check_writes(idx, sp)
+        idx, sp, value = idx[keep], sp[keep], value[keep]
+        self._put(idx, sp, value)
+        self.flag_value[idx] = value
+        self._advance(idx, next_pc)
+
+    def _pushr(self, idx, arg, next_pc):
+        if arg == REG_SP:
+            values = self.sp[idx]
+        elif arg == REG_BP:
+            values = self.bp[idx]
+        elif arg == REG_PC:
+            values = np.full(len(idx), next_pc, dtype=np.int64)
+        else:
+            err = InvalidOpcodeError(opcode=Opcode.PUSHR, offset=next_pc - DWORD)
+            self._fault(idx, lambda lane: err)
+            return
+
+        self._push(idx, values, next_pc)
+
+    def _popr(self, idx, arg, next_pc):
+        if arg not in (REG_SP, REG_BP, REG_PC):
+            err = InvalidOpcodeError(opcode=Opcode.POPR, offset=next_pc - DWORD)
+            self._fault(idx, lambda lane: err)
+            return
+
+        idx, sp, (value,) = self._pop_values(idx, 1)
+        self.sp[idx] = (sp + DWORD) & DWORD_MASK
+        self.flag_value[idx] = value
+        if arg == REG_PC:
+            self._advance(idx, value)
+            return
+
+        if arg == REG_SP:
+            self.sp[idx] = value
+        else:
+            self.bp[idx] = value
+
+        self._advance(idx, next_pc)
+
+    def _jmp(self, idx, arg, next_pc):
+        self._advance(idx, arg)
+
+    def _if(self, idx, arg, next_pc):
+        idx, sp, (cond,) = self._pop_values(idx, 1)
+        self.sp[idx] = (sp + DWORD) & DWORD_MASK
+        self._advance(idx, np.where(cond == 0, arg, next_pc))
+
+    def _call(self, idx, arg, next_pc):
+        idx, sp, (addr,) = self._pop_values(idx, 1)
+        keep = self._check_writes(idx, sp)
+        idx, sp, addr = idx[keep], sp[keep], addr[keep]
+        self._put(idx, sp, np.full(len(idx), next_pc, dtype=np.int64))
+        self._advance(idx, addr)
+
+    def _ret(self, idx, arg, next_pc):
+        idx, sp, (addr,) = self._pop_values(idx, 1)
+        self.sp[idx] = (sp + DWORD) & DWORD_MASK
+        self._advance(idx, addr)
+
+    def _halt(self, idx, arg, next_pc):
+        self._advance(idx, next_pc)
+        self.status[idx] = RunStatus.HALTED.value
+
+    def _brk(self, idx, arg, next_pc):
+        self._advance(idx, next_pc)
+        self.status[idx] = RunStatus.BREAK.value
+
+    handlers = {
+        Opcode.NOP: _nop,
+        Opcode.PUSHI: _pushi,
+        Opcode.ADDI: _addi,
+        Opcode.SUBI: _subi,
+        Opcode.RET: _ret,
+        Opcode.BRK: _brk,
+        Opcode.STRI: _storei,
+        Opcode.FCHI: _fetchi,
+        Opcode.PUSHR: _pushr,
+        Opcode.POPR: _popr,
+        Opcode.DROPI: _dropi,
+        Opcode.ANDI: _andi,
+        Opcode.ORI: _ori,
+        Opcode.XORI: _xori,
+        Opcode.DUPI: _dupi,
+        Opcode.OVERI: _overi,
+        Opcode.SWAPI: _swapi,
+        Opcode.JMP: _jmp,
+        Opcode.IF: _if,
+        Opcode.CALL: _call,
+        Opcode.HALT: _halt,
+    }
@@ -0,0 +1,134 @@
+from .opcode import Opcode
+from .stack_machine import DWORD_STRUCT
+
+# where the memory sweep keeps its data, well clear of the generated code
+DATA_BASE = 0x8000
+
+class Program:
+    def __init__(self):
+        self.words = []
+        self.labels = {}
+        self.fixups = []
+
+    def label(self, name):
+        self.labels[name] = len(self.words) * 4
+
+    def op(self, code, imm=None):
+        self.words.append(int(code))
+        if isinstance(imm, str):
+            self.fixups.append((len(self.words), imm))
+            self.words.append(0)
+        elif imm is not None:
+            self.words.append(imm)
+
+        return self
+
+    def image(self):
+        words = list(self.words)
+        for index, name in self.fixups:
+            words[index] = self.labels[name]
+
+        return b"".join(DWORD_STRUCT.pack(word) for word in words)
+
+# counter on the stack, add/sub churn in the body
+def arith_loop(iterations):
+    p = Program()
+    p.op(Opcode.PUSHI, iterations)
+    p.label("loop")
+    p.op(Opcode.DUPI).op(Opcode.IF, "end")
+    p.op(Opcode.PUSHI, 1).op(Opcode.SUBI)
+    p.op(Opcode.PUSHI, 7).op(Opcode.ADDI)
+    p.op(Opcode.PUSHI, 7).op(Opcode.SUBI)
+    p.op(Opcode.JMP, "loop")
+    p.label("end")
+    p.op(Opcode.HALT)
+    return p.image()
+
+# f(n) = n == 0 ? 0 : f(n - 1) + 1, called reps times
+def recursion(depth, reps):
+    p = Program()
+    p.op(Opcode.PUSHI, reps)
+    p.label("loop")
+    p.op(Opcode.DUPI).op(Opcode.IF, "end")
+    p.op(Opcode.PUSHI, depth).op(Opcode.PUSHI, "f").op(Opcode.CALL)
+    p.op(Opcode.DROPI)
+    p.op(Opcode.PUSHI, 1).op(Opcode.SUBI)
+    p.op(Opcode.JMP, "loop")
+    p.label("end")
+    p.op(Opcode.HALT)
+
+    p.label("f")
+    p.op(Opcode.SWAPI).op(Opcode.DUPI).op(Opcode.IF, "base")
+    p.op(Opcode.PUSHI, 1).op(Opcode.SUBI)
+    p.op(Opcode.PUSHI, "f").op(Opcode.CALL)
+    p.op(Opcode.PUSHI, 1).op(Opcode.ADDI)
+    p.label("base")
+    p.op(Opcode.SWAPI).op(Opcode.RET)
+    return p.image()
+
+# increments every word of a DATA_BASE buffer, reps times
+def memory_sweep(words, reps):
+    p = Program()
+    p.op(Opcode.PUSHI, reps)
+    p.label("outer")
+    p.op(Opcode.DUPI).op(Opcode.IF, "end")
+    p.op(Opcode.PUSHI, DATA_BASE + words * 4)
+    p.label("inner")
+    p.op(Opcode.DUPI).op(Opcode.PUSHI, DATA_BASE).op(Opcode.SUBI)
+    p.op(Opcode.IF, "inner_end")
+    p.op(Opcode.PUSHI, 4).op(Opcode.SUBI)
+    p.op(Opcode.DUPI).op(Opcode.FCHI)
+    p.op(Opcode.PUSHI, 1).op(Opcode.ADDI)
+    p.op(Opcode.OVERI).op(Opcode.STRI)
+    p.op(Opcode.JMP, "inner")
+    p.label("inner_end")
+    p.op(Opcode.DROPI)
+    p.op(Opcode.PUSHI, 1).op(Opcode.SUBI)
+    p.op(Opcode.JMP, "outer")
+    p.label("end")
+    p.op(Opcode.HALT)
+    return p.image()
+
+# dup/over/swap traffic that leaves the stack as it found it
+def stack_shuffle(iterations):
+    p = Program()
+    p.op(Opcode.PUSHI, iterations)
+    p.label("loop")
+    p.op(Opcode.DUPI).op(Opcode.IF, "end")
+    p.op(Opcode.PUSHI, 1).op(Opcode.PUSHI, 2)
+    p.op(Opcode.OVERI).op(Opcode.SWAPI).op(Opcode.DUPI)
+    p.op(Opcode.DROPI).op(Opcode.DROPI).op(Opcode.DROPI).op(Opcode.DROPI)
+    p.op(Opcode.PUSHI, 1).op(Opcode.SUBI)
+    p.op(Opcode.JMP, "loop")
+    p.label("end")
+    p.op(Opcode.HALT)
+    return p.image()
+
+WORKLOADS = {
+    "arith_loop": lambda: arith_loop(100000),
+    "recursion": lambda: recursion(1000, 100),
+    "memory_sweep": lambda: memory_sweep(1024, 100),
+    "stack_shuffle": lambda: stack_shuffle(100000),
+}
+
+# fractional slowdown past which a workload counts as a regression
+THRESHOLD = 0.10
+
+# load times are sub-millisecond, so ignore differences below this
+LOAD_SLACK = 0.001
+
+# (name, metric, before, after) for every result that regressed past
+# threshold against baseline
+def compare(results, baseline, threshold=THRESHOLD):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+
+        if result["ips"] < base["ips"] * (1 - threshold):
+            regressions.append((name, "ips", base["ips"], result["ips"]))
+        if result["load_time"] > base["load_time"] * (1 + threshold) + LOAD_SLACK:
+            regressions.append((name, "load_time", base["load_time"], result["load_time"]))
+
+    return regressions
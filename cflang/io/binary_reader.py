@@ -6,7 +6,9 @@ class BinaryReader:
         self.provider = provider
 
     def read_dword(self):
-        byte_data = bytearray(self.read_byte() for _ in range(4))
+        byte_data = bytearray(4)
+        if self.read_bytes(byte_data) < len(byte_data):
+            raise EndOfFileBinaryReader
         i = int.from_bytes(byte_data, byteorder='little')
         self._prime_buffer()
         return i
@@ -21,14 +23,28 @@ class BinaryReader:
 
     def read_bytes(self, into):
         try:
-            buf_len = len(into)
-            n = 0
-            while n < buf_len:
-                b = self.read_byte()
-                into[n] = b
-                n += 1
-        except EndOfFileBinaryReader:
-            pass
+            view = memoryview(into).cast('B')
+        except TypeError:
+            # not a buffer (e.g. a list), read into a temporary and copy over
+            data = bytearray(len(into))
+            n = self.read_bytes(data)
+            into[:n] = data[:n]
+            return n
+
+        n = 0
+        buf_len = len(view)
+        if self.buffer is not None and buf_len:
+            view[0] = self.buffer
+            self.buffer = None
+            n = 1
+
+        while n < buf_len:
+            count = self.provider.readinto(view[n:])
+            if not count:
+                break
+            n += count
+
+        return n
 
     def _prime_buffer(self):
         if self.buffer is None:
@@ -12,3 +12,16 @@ class BinaryReaderFileProvider(BinaryReaderProvider):
     def read(self):
         self._ensure_open()
         return self.file.read(1)
+
+    def readinto(self, buffer):
+        self._ensure_open()
+        n = 0
+        buf_len = len(buffer)
+        view = memoryview(buffer)
+        while n < buf_len:
+            count = self.file.readinto(view[n:])
+            if not count:
+                break
+            n += count
+
+        return n
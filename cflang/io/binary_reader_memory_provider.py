@@ -13,3 +13,10 @@ class BinaryReaderMemoryProvider(BinaryReaderProvider):
             self.pos += 1
 
         return b
+
+    def readinto(self, buffer):
+        chunk = self.data[self.pos:self.pos + len(buffer)]
+        n = len(chunk)
+        buffer[:n] = bytes(chunk)
+        self.pos += n
+        return n
@@ -0,0 +1,42 @@
+import mmap
+import os
+from .binary_reader_provider import BinaryReaderProvider
+
+class BinaryReaderMmapProvider(BinaryReaderProvider):
+    def __init__(self, path):
+        self.path = path
+        self.map = None
+        self.pos = 0
+
+    def _ensure_open(self):
+        if self.map is None:
+            with open(self.path, 'rb') as file:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def size(self):
+        return os.path.getsize(self.path)
+
+    def read(self):
+        self._ensure_open()
+        b = self.map[self.pos:self.pos + 1]
+        self.pos += len(b)
+        return b
+
+    def readinto(self, buffer):
+        self._ensure_open()
+        chunk = memoryview(self.map)[self.pos:self.pos + len(buffer)]
+        n = len(chunk)
+        buffer[:n] = chunk
+        chunk.release()
+        self.pos += n
+        return n
+
+    # maps the first size bytes of the file as private copy on write memory,
+    # pages are shared with every other mapping of the file until written.
+    # returns None when the file is too short to back the whole range
+    def map_image(self, size):
+        if self.size() < size:
+            return None
+
+        with open(self.path, 'rb') as file:
+            return mmap.mmap(file.fileno(), size, access=mmap.ACCESS_COPY)
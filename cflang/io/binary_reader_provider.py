@@ -1,3 +1,16 @@
 class BinaryReaderProvider:
     def read(self):
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    # fills as much of buffer as possible, returning the number of bytes read
+    def readinto(self, buffer):
+        n = 0
+        buf_len = len(buffer)
+        while n < buf_len:
+            b = self.read()
+            if len(b) == 0:
+                break
+            buffer[n] = b[0]
+            n += 1
+
+        return n
@@ -1,60 +1,88 @@
 from .pushback_byte_stream import PushbackByteStream
 from .location import Location
-from collections import deque
+from bisect import bisect_right
+import codecs
 
+CHUNK_SIZE = 1 << 16
+
+# chars kept ahead of a refill so recently read ones can still be pushed back
+PUSHBACK_DEPTH = 64
+
+# reads the file in chunks through an incremental utf-8 decoder into a str
+# buffer with a cursor. pushback only moves the cursor back, so it expects the
+# chars just read, in reverse order, as both tokenizers push them back.
+# locations are found from the offsets of line starts seen so far
 class FilePushbackByteStream(PushbackByteStream):
-    def __init__(self, path):
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
         self.path = path
-        self.line_no = 1
-        self.pos = 1
+        self.chunk_size = chunk_size
         self.file = None
-        self.buffer = deque()
-        self.line_lens = []
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.text = ""
+        self.cursor = 0
+        # offset in the whole source of text[0]
+        self.base = 0
+        self.line_starts = [0]
+        self.done = False
 
     def next(self):
-        self._prime_buffer()
-        if not self.buffer:
+        if self.cursor >= len(self.text) and not self._fill():
             return ''
 
-        c = self.buffer.popleft()
-        if c == '\n':
-            self.line_no += 1
-            self.line_lens.append(self.pos)
-            self.pos = 1
-        else:
-            self.pos += 1
-
+        c = self.text[self.cursor]
+        self.cursor += 1
         return c
 
     def pushback(self, c):
-        self.buffer.appendleft(c)
-        if self.pos == 1:
-            self.pos = self.line_lens.pop()
-            self.line_no -= 1
-        else:
-            self.pos -= 1
+        self.cursor -= 1
 
     def eos(self):
-        if self.buffer:
-            return False
+        return self.cursor >= len(self.text) and not self._fill()
 
-        self._prime_buffer()
-        return not bool(self.buffer)
+    def read_all(self):
+        chunks = []
+        while self.cursor < len(self.text) or self._fill():
+            chunks.append(self.text[self.cursor:])
+            self.cursor = len(self.text)
+
+        return "".join(chunks)
 
     def get_location(self):
-        return Location(self.path, self.line_no, self.pos)
+        offset = self.base + self.cursor
+        line = bisect_right(self.line_starts, offset) - 1
+        return Location(self.path, line + 1, offset - self.line_starts[line] + 1)
 
     def _ensure_open(self):
         if not self.file:
-            # self.file = open(self.path, 'r', encoding="utf-8")
-            # self.file = open(self.path, 'r', encoding="ascii")
             self.file = open(self.path, 'rb')
 
-    def _prime_buffer(self):
-        if not self.buffer:
+    # returns whether there is more text past the cursor
+    def _fill(self):
+        while not self.done:
             self._ensure_open()
-            c = self.file.read(1)
-            if c:
-                d = c.decode(errors="replace")
-                d = "?" if d =="�" else d
-                self.buffer.append(d)
+            data = self.file.read(self.chunk_size)
+            chunk = self.decoder.decode(data, not data)
+            if not data:
+                self.done = True
+                self.file.close()
+
+            if chunk:
+                self._append(chunk.replace("�", "?"))
+                return True
+
+        return False
+
+    def _append(self, chunk):
+        keep = self.text[-PUSHBACK_DEPTH:]
+        dropped = len(self.text) - len(keep)
+        self.base += dropped
+        self.cursor -= dropped
+
+        start = self.base + len(keep)
+        line_starts = self.line_starts
+        i = chunk.find("\n")
+        while i != -1:
+            line_starts.append(start + i + 1)
+            i = chunk.find("\n", i + 1)
+
+        self.text = keep + chunk
@@ -0,0 +1,5 @@
+from .binary_reader_mmap_provider import BinaryReaderMmapProvider
+from .binary_reader import BinaryReader
+
+def MmapBinaryReader(path):
+    return BinaryReader(BinaryReaderMmapProvider(path))
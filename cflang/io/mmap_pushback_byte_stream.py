@@ -0,0 +1,125 @@
+from .pushback_byte_stream import PushbackByteStream
+from .location import Location
+from bisect import bisect_right
+import mmap
+
+# reads utf-8 chars straight out of a read only mapping of the file, one
+# char at a time, so read that way the file is never held as a python str
+# or bytes. read_all copies the rest into one str, as the tokenizers do, so
+# they gain nothing from the mapping. a byte that does not start a valid
+# sequence reads as '?'. pushback steps the cursor back over the encoded
+# length of the char, which must be the one just read. line starts are
+# indexed as far as locations have been asked for
+class MmapPushbackByteStream(PushbackByteStream):
+    def __init__(self, path):
+        self.path = path
+        self.map = None
+        with open(path, 'rb') as f:
+            self.size = f.seek(0, 2)
+            if self.size:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.cursor = 0
+        self.line_starts = [0]
+        # offset up to which line starts are indexed
+        self.indexed = 0
+        # (offset, line start, chars from the line start) of the last location
+        self.last_column = (0, 0, 0)
+
+    def next(self):
+        cursor = self.cursor
+        if cursor >= self.size:
+            return ''
+
+        b = self.map[cursor]
+        if b < 0x80:
+            self.cursor = cursor + 1
+            return chr(b)
+
+        c, length = self._decode(cursor, b)
+        self.cursor = cursor + length
+        return c
+
+    def pushback(self, c):
+        self.cursor -= 1 if c < '\x80' else len(c.encode())
+
+    def eos(self):
+        return self.cursor >= self.size
+
+    # decodes the rest of the mapping in bulk, a full copy of it
+    def read_all(self):
+        if self.cursor >= self.size:
+            return ""
+
+        try:
+            text = self.map[self.cursor:].decode()
+        except UnicodeDecodeError:
+            # invalid bytes read as one '?' each
+            return super().read_all()
+
+        self.cursor = self.size
+        return text
+
+    def get_location(self):
+        cursor = self.cursor
+        if cursor > self.indexed:
+            self._index_lines(cursor)
+
+        line = bisect_right(self.line_starts, cursor) - 1
+        start = self.line_starts[line]
+        offset, last_start, chars = self.last_column
+        # locations are mostly asked for moving forward along a line
+        if last_start == start and offset <= cursor:
+            chars += self._count_chars(offset, cursor)
+        else:
+            chars = self._count_chars(start, cursor)
+
+        self.last_column = (cursor, start, chars)
+        return Location(self.path, line + 1, chars + 1)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def _decode(self, offset, lead):
+        if 0xc2 <= lead <= 0xdf:
+            length = 2
+        elif 0xe0 <= lead <= 0xef:
+            length = 3
+        elif 0xf0 <= lead <= 0xf4:
+            length = 4
+        else:
+            return '?', 1
+
+        try:
+            return self.map[offset:offset + length].decode(), length
+        except UnicodeDecodeError:
+            return '?', 1
+
+    def _index_lines(self, end):
+        line_starts = self.line_starts
+        i = self.map.find(b"\n", self.indexed, end)
+        while i != -1:
+            line_starts.append(i + 1)
+            i = self.map.find(b"\n", i + 1, end)
+
+        self.indexed = end
+
+    def _count_chars(self, start, end):
+        if start == end:
+            return 0
+
+        try:
+            return len(self.map[start:end].decode())
+        except UnicodeDecodeError:
+            pass
+
+        count = 0
+        offset = start
+        while offset < end:
+            b = self.map[offset]
+            offset += 1 if b < 0x80 else self._decode(offset, b)[1]
+            count += 1
+
+        return count
@@ -13,3 +13,11 @@ class PushbackByteStream:
 
     def get_location(self):
         pass
+
+    # the rest of the stream as one str, leaving the stream at its end
+    def read_all(self):
+        chars = []
+        while not self.eos():
+            chars.append(self.next())
+
+        return "".join(chars)
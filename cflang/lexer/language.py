@@ -0,0 +1,94 @@
+import re
+
+ID = r"[A-Za-z_][A-Za-z0-9_]*"
+
+ESCAPE = re.compile(r"\\(.)")
+
+# what a token is, by its first char
+ID_CLASS, NUMBER_CLASS, STRING_CLASS, CHAR_CLASS = range(4)
+
+# a language's token tables and lexical rules, and the master regex Scanner
+# runs on built from them. a newline is either whitespace or, when it is in
+# single_char_tokens, a token, and then comments stop short of it. escapes
+# maps the char after a backslash in strings and chars to its value; without
+# it a backslash is a plain char. chars and floats turn on char literals and
+# decimal floats
+class Language:
+    def __init__(self, token_type, single_char_tokens,
+                 double_char_tokens=None, reserved=None, comment="//",
+                 whitespace=" \t\n", escapes=None, chars=False, floats=False):
+        self.token_type = token_type
+        self.ops = {**single_char_tokens, **(double_char_tokens or {})}
+        self.reserved = reserved or {}
+        self.comment = comment
+        self.newline = single_char_tokens.get("\n")
+        self.escapes = escapes
+        self.floats = floats
+
+        # token tables store types as their codes
+        self.types_by_code = [None] * (max(t.value for t in token_type) + 1)
+        for t in token_type:
+            self.types_by_code[t.value] = t
+        self.op_codes = {op: t.value for op, t in self.ops.items()}
+        self.reserved_codes = {word: t.value for word, t in self.reserved.items()}
+
+        self.char_classes = {
+            **{c: ID_CLASS for c in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_"},
+            **{c: NUMBER_CLASS for c in "0123456789"},
+            "\"": STRING_CLASS,
+        }
+        # token types whose value is their unescaped contents
+        self.valued = {token_type.STRING}
+        if chars:
+            self.char_classes["'"] = CHAR_CLASS
+            self.valued.add(token_type.CHAR)
+
+        self.pattern = re.compile(self._pattern(
+            single_char_tokens, double_char_tokens or {}, whitespace, chars))
+
+    # each match is (skipped, token, error): the whitespace and comments
+    # before a token, then either a token or an error. hex and 0. floats take
+    # one more char past their digits, which is dropped. at the end both are
+    # empty, and a comment running into the end of the source is skipped
+    def _pattern(self, single_char_tokens, double_char_tokens, whitespace, chars):
+        space = "".join(re.escape(c) for c in whitespace)
+        comment = re.escape(self.comment)
+        if self.newline is not None:
+            skipped = rf"(?:[{space}]+|{comment}[^\n]*)*"
+        else:
+            skipped = rf"(?:[{space}]+|{comment}[^\n]*\n)*(?:{comment}[^\n]*\Z)?"
+
+        doubles = sorted(double_char_tokens, key=len, reverse=True)
+        singles = "".join(re.escape(c) for c in single_char_tokens)
+        tokens = [ID, *(re.escape(op) for op in doubles), f"[{singles}]"]
+        if self.floats:
+            tokens += [r"[1-9][0-9]*(?:\.[0-9]+)?", r"0x[0-9a-fA-F]+[\s\S]?", r"0\.[0-9]+[\s\S]?"]
+        else:
+            tokens += [r"[1-9][0-9]*", r"0x[0-9a-fA-F]+[\s\S]?"]
+        tokens.append(r"0(?!x)")
+
+        errors = ["0x"]
+        if self.escapes:
+            escape = "[" + "".join(re.escape(c) for c in self.escapes) + "]"
+            string = rf"\"[^\"\\\n]*(?:\\{escape}[^\"\\\n]*)*"
+            tokens.append(string + "\"")
+            errors.append(string + r"(?:\\[^\n]?)?")
+            if chars:
+                tokens.append(rf"'(?:[^'\\\n]|\\{escape})?'")
+                errors.append(rf"'(?:\\(?:{escape}[^'\n]?|[^\n]?)|[^\\\n][^'\n]?)?")
+        else:
+            tokens.append(r"\"[^\"\n]*\"")
+            errors.append(r"\"[^\"\n]*")
+            if chars:
+                tokens.append(r"'[^'\n]?'")
+                errors.append(r"'(?:[^'\n][^'\n]?)?")
+        errors.append(".")
+
+        return rf"({skipped})(?:({'|'.join(tokens)})|({'|'.join(errors)})|\Z)"
+
+    def unescape(self, body):
+        if self.escapes is None or "\\" not in body:
+            return body
+
+        escapes = self.escapes
+        return ESCAPE.sub(lambda m: escapes[m.group(1)], body)
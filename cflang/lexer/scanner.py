@@ -0,0 +1,222 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from .language import ID_CLASS, NUMBER_CLASS, STRING_CLASS
+from .source_text import SourceText
+from .span_token import SpanToken
+from .token_table import TokenTable
+
+HEX_DIGITS = set("0123456789abcdefABCDEF")
+
+# reads a source file the way FilePushbackByteStream decodes it
+def read_source(path):
+    with open(path, "rb") as f:
+        return f.read().decode("utf-8", "replace").replace("�", "?")
+
+# scans a whole text in one regex pass of a language's pattern into a
+# TokenTable, giving the tokens and locations its char at a time tokenizer
+# used to
+def scan(source_text):
+    table = TokenTable(source_text)
+    _scan(table, source_text.language.pattern.findall(source_text.text), 0)
+    return table
+
+# adds the tokens of matches, the pattern's groups from offset pos on, to
+# table. returns False if matches stop before the end of the text
+def _scan(table, matches, pos):
+    language = table.source_text.language
+    add_type = table.types.append
+    add_start = table.starts.append
+    add_end = table.ends.append
+    classes = language.char_classes
+    op_codes = language.op_codes
+    reserved_codes = language.reserved_codes
+    token_type = language.token_type
+    id_code = token_type.ID.value
+    error_code = token_type.ERROR.value
+    string_code = token_type.STRING.value
+
+    for skipped, buffer, error in matches:
+        start = pos + len(skipped)
+        if buffer:
+            pos = start + len(buffer)
+            code = op_codes.get(buffer)
+            if code is None:
+                kind = classes[buffer[0]]
+                if kind == ID_CLASS:
+                    code = reserved_codes.get(buffer, id_code)
+                elif kind == NUMBER_CLASS:
+                    code, buffer = _number(token_type, buffer)
+                elif kind == STRING_CLASS:
+                    code = string_code
+                else:
+                    code = token_type.CHAR.value
+
+            add_type(code)
+            add_start(start)
+            add_end(start + len(buffer))
+        elif error:
+            pos = start + len(error)
+            add_type(error_code)
+            add_start(start)
+            add_end(pos)
+        else:
+            break
+    else:
+        return False
+
+    # skipped is what ran up to the end of the text. its last line may be a
+    # comment
+    tail = skipped[skipped.rfind("\n") + 1:]
+    comment = tail.find(language.comment)
+    if comment >= 0:
+        # cut off by the end, the comment is where the tokenizers stopped
+        table.end = start - len(tail) + comment
+        return True
+
+    table.end = start
+    if (language.newline is None and skipped.endswith("\n")
+            and language.comment in skipped[skipped.rfind("\n", 0, -1) + 1:]):
+        # ended by a newline, the tokenizers read one more char past the end
+        # and made an empty error token of it
+        add_type(error_code)
+        add_start(start)
+        add_end(start)
+
+    return True
+
+# the number's type code and buffer, less the char hex and 0. floats drop
+def _number(token_type, buffer):
+    if buffer[0] != "0" or len(buffer) == 1:
+        type = token_type.FLOAT if "." in buffer else token_type.INTEGER
+        return type.value, buffer
+
+    digits = HEX_DIGITS if buffer[1] == "x" else "0123456789"
+    if buffer[-1] not in digits:
+        buffer = buffer[:-1]
+
+    type = token_type.INTEGER if buffer[1] == "x" else token_type.FLOAT
+    return type.value, buffer
+
+def tokenize_all(language, source, text=None):
+    if text is None:
+        text = read_source(source)
+
+    return scan(SourceText(language, text, source))
+
+# updates table, from scan or tokenize_all, for an edit of its text that
+# replaces removed chars at offset with inserted. returns (first, old_stop,
+# new_stop): the tokens from first to old_stop were replaced by the ones
+# from first to new_stop. no token or comment runs past a newline, so any
+# token start is a safe place to restart. scanning restarts at the last
+# token ending two chars before the edit, as far as a token looks past its
+# end, and stops once a token starts where a token after the edit did
+def retokenize(table, offset, removed, inserted):
+    old = table.source_text
+    text = old.text[:offset] + inserted + old.text[offset + removed:]
+    source_text = SourceText(old.language, text, old.source, old.line_no, old.pos)
+    delta = len(inserted) - removed
+    starts = table.starts
+    stop = len(starts)
+
+    restart = bisect_right(table.ends, offset - 2) - 1
+    if restart < 0:
+        restart = pos = 0
+    else:
+        pos = starts[restart]
+    # the first old token that can line up with a new one
+    resync = bisect_left(starts, offset + removed)
+
+    def matches():
+        nonlocal resync
+        for m in source_text.language.pattern.finditer(text, pos):
+            # the last match, at the end, is left to _scan
+            if m.lastindex > 1:
+                target = m.end(1) - delta
+                while resync < stop and starts[resync] < target:
+                    resync += 1
+                if resync < stop and starts[resync] == target:
+                    return
+
+            yield m.groups()
+
+    part = TokenTable(source_text)
+    if _scan(part, matches(), pos):
+        resync = stop
+        table.end = part.end
+    else:
+        table.end += delta
+
+    # tokens before the edit scanned again as they were
+    same = 0
+    while (same < len(part) and restart + same < resync
+           and part.types[same] == table.types[restart + same]
+           and part.starts[same] == starts[restart + same]
+           and part.ends[same] == table.ends[restart + same]):
+        same += 1
+    first = restart + same
+
+    table.types = table.types[:first] + part.types[same:] + table.types[resync:]
+    table.starts = (table.starts[:first] + part.starts[same:]
+                    + _shifted(table.starts[resync:], delta))
+    table.ends = (table.ends[:first] + part.ends[same:]
+                  + _shifted(table.ends[resync:], delta))
+    table.source_text = source_text
+    return first, resync, first + len(part) - same
+
+def _shifted(offsets, delta):
+    if not delta:
+        return offsets
+
+    return array(offsets.typecode, map(delta.__add__, offsets))
+
+# the pull style next/pushback/eos of the tokenizers over a TokenTable
+class TokenReader:
+    def __init__(self, table):
+        self.table = table
+        self.tokens = iter(table)
+        self.token_buffer = deque()
+        self.done = False
+        self.end = table.end
+
+    def next(self):
+        if self.token_buffer:
+            return self.token_buffer.popleft()
+
+        t = self._read_token()
+        if t:
+            return t
+
+        end_type = self.table.source_text.language.token_type.END
+        return SpanToken(end_type, self.end, self.end, self.table.source_text)
+
+    def pushback(self, c):
+        self.token_buffer.appendleft(c)
+
+    def eos(self):
+        if self.token_buffer:
+            return False
+
+        t = self._read_token()
+        if t:
+            self.token_buffer.append(t)
+
+        return not bool(self.token_buffer)
+
+    def _read_token(self):
+        t = next(self.tokens, None)
+        if t is None:
+            if self.done:
+                # the tokenizers looked for a token again from the end
+                self.end = len(self.table.source_text.text)
+            self.done = True
+
+        return t
+
+# scans text up front and reads it as tokens. line_no and pos are where the
+# text starts in the source
+class Scanner(TokenReader):
+    def __init__(self, language, text, source=None, line_no=1, pos=1):
+        self.language = language
+        self.text = text
+        super().__init__(scan(SourceText(language, text, source, line_no, pos)))
@@ -0,0 +1,36 @@
+from bisect import bisect_right
+import re
+from cflang.io.location import Location
+
+NEWLINE = re.compile("\n")
+
+# a scanned text and what its tokens need to make their buffers, values and
+# locations on demand. line_no and pos are where the text starts in source.
+# lines are indexed the first time a location is asked for
+class SourceText:
+    def __init__(self, language, text, source=None, line_no=1, pos=1):
+        self.language = language
+        self.text = text
+        self.source = source
+        self.line_no = line_no
+        self.pos = pos
+        self.line_starts = None
+
+    def location(self, offset):
+        line_starts = self.line_starts
+        if line_starts is None:
+            line_starts = [0]
+            line_starts.extend(m.end() for m in NEWLINE.finditer(self.text))
+            self.line_starts = line_starts
+
+        line = bisect_right(line_starts, offset) - 1
+        if not line:
+            return Location(self.source, self.line_no, offset + self.pos)
+
+        return Location(self.source, self.line_no + line, offset - line_starts[line] + 1)
+
+    def value(self, type, start, end):
+        if type not in self.language.valued:
+            return None
+
+        return self.language.unescape(self.text[start + 1:end - 1])
@@ -0,0 +1,28 @@
+# a token as its type and its span of a SourceText. the buffer, value and
+# location are made when asked for, so a token costs one small object
+class SpanToken:
+    __slots__ = ("type", "start", "end", "text")
+
+    def __init__(self, type, start, end, text):
+        self.type = type
+        self.start = start
+        self.end = end
+        self.text = text
+
+    @property
+    def buffer(self):
+        return self.text.text[self.start:self.end]
+
+    @property
+    def value(self):
+        return self.text.value(self.type, self.start, self.end)
+
+    @property
+    def location(self):
+        return self.text.location(self.start)
+
+    def __repr__(self):
+        return (f"SpanToken(type={self.type}, "
+            f"buffer={repr(self.buffer)}, "
+            f"value={repr(self.value)}, "
+            f"location={repr(self.location)})")
@@ -0,0 +1,36 @@
+from array import array
+from bisect import bisect_left
+from .span_token import SpanToken
+
+# the tokens of a whole source as columns of type codes and start and end
+# offsets into its SourceText, indexable without making token objects. end
+# is the offset of END
+class TokenTable:
+    def __init__(self, source_text):
+        self.source_text = source_text
+        self.types = array("B")
+        self.starts = array("q")
+        self.ends = array("q")
+        self.end = 0
+        self.types_by_code = source_text.language.types_by_code
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, i):
+        return SpanToken(
+            self.types_by_code[self.types[i]], self.starts[i], self.ends[i],
+            self.source_text)
+
+    def __iter__(self):
+        types_by_code = self.types_by_code
+        source_text = self.source_text
+        for code, start, end in zip(self.types, self.starts, self.ends):
+            yield SpanToken(types_by_code[code], start, end, source_text)
+
+    def type(self, i):
+        return self.types_by_code[self.types[i]]
+
+    # index of the first token starting at or after offset
+    def index(self, offset):
+        return bisect_left(self.starts, offset)
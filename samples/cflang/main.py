@@ -1,5 +1,6 @@
 from cflang.io.file_pushback_byte_stream import FilePushbackByteStream
 from cflang.cflang.token.tokenizer import Tokenizer
+from cflang.cflang.token.scanner import Scanner
 from cflang.cflang.token.token import TokenType
 import sys
 
@@ -9,13 +10,16 @@ def safe_index(arr, idx, default):
 
     return arr[idx]
 
-s = FilePushbackByteStream(safe_index(sys.argv, 1, "sample_data/cflang/token/literals.cflang"))
+# --scan reads the source straight into a str without a stream
+args = [arg for arg in sys.argv if arg != "--scan"]
+path = safe_index(args, 1, "sample_data/cflang/token/literals.cflang")
+s = FilePushbackByteStream(path)
 # s = FilePushbackByteStream("samples/token/int.cflang")
 # s = FilePushbackByteStream("samples/token/string.cflang")
 # while not s.eos():
 #     print(s.next())
 
-tr = Tokenizer(s)
+tr = Scanner.from_file(path) if "--scan" in sys.argv else Tokenizer(s)
 done = False
 while not done:
     t = tr.next()
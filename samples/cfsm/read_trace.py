@@ -0,0 +1,27 @@
+from cflang.cfsm.trace import read_trace, filter_trace, format_record
+from cflang.cfsm.opcode import Opcode
+from collections import deque
+import argparse
+import sys
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode and filter a cfsm trace")
+    parser.add_argument("path")
+    parser.add_argument("--pc", action="append", type=lambda s: int(s, 0),
+                        help="only records at this pc, repeatable")
+    parser.add_argument("--op", action="append", choices=[op.name for op in Opcode],
+                        help="only records for this opcode, repeatable")
+    parser.add_argument("--tail", type=int, default=None, help="only the last N records")
+    args = parser.parse_args()
+
+    pcs = set(args.pc) if args.pc else None
+    opcodes = {Opcode[name] for name in args.op} if args.op else None
+    records = filter_trace(read_trace(args.path), pcs, opcodes)
+    if args.tail is not None:
+        records = deque(records, maxlen=args.tail)
+
+    for record in records:
+        print(format_record(record))
+
+if __name__ == "__main__":
+    sys.exit(main())
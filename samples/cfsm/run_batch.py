@@ -0,0 +1,22 @@
+from cflang.cfsm.batch import collect_programs, run_batch
+import argparse
+import json
+import sys
+
+def main():
+    parser = argparse.ArgumentParser(description="Run cfsm binaries in parallel")
+    parser.add_argument("sources", nargs="+", help="binaries or directories of binaries")
+    parser.add_argument("--max-steps", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=None, help="seconds per program")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-dir", default=None,
+                        help="reuse decoded programs across runs")
+    args = parser.parse_args()
+
+    paths = collect_programs(args.sources)
+    for result in run_batch(paths, args.max_steps, args.timeout, args.workers,
+                            args.cache_dir):
+        print(json.dumps(result), flush=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
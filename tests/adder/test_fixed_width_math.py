@@ -1,4 +1,6 @@
 import cflang.cfsm.fixed_width_math as FixedWidthAdder
+from cflang.cfsm.data_size import WORD, DWORD
+from cflang.cfsm.flag_result import OVERFLOW, ZERO, CARRY, NEGATIVE
 
 def test_add_with_overflow():
     n1 = 0x7f
@@ -44,3 +46,51 @@ def test_sub_wrap_no_overflow():
     assert flags.carry is True
     assert flags.negative is True
 
+def test_dword_fast_path():
+    assert FixedWidthAdder.add_dword(0xffffffff, 0x01) == 0
+    assert FixedWidthAdder.add_dword_flags(0xffffffff, 0x01) == ZERO | CARRY
+    assert FixedWidthAdder.add_dword_flags(0x7fffffff, 0x01) == OVERFLOW | NEGATIVE
+    assert FixedWidthAdder.sub_dword(0x00, 0x01) == 0xffffffff
+    assert FixedWidthAdder.sub_dword_flags(0x00, 0x01) == CARRY | NEGATIVE
+    assert FixedWidthAdder.sub_dword_flags(0x80000000, 0x01) == OVERFLOW
+
+def test_fast_path_matches_flag_result():
+    for n1 in range(0, 0x100, 7):
+        for n2 in range(0, 0x100, 5):
+            r, flags = FixedWidthAdder.add(1, n1, n2)
+            assert r == FixedWidthAdder.add_byte(n1, n2)
+            assert flags.to_bits() == FixedWidthAdder.add_byte_flags(n1, n2)
+
+            r, flags = FixedWidthAdder.sub(1, n1, n2)
+            assert r == FixedWidthAdder.sub_byte(n1, n2)
+            assert flags.to_bits() == FixedWidthAdder.sub_byte_flags(n1, n2)
+
+def test_add_batch():
+    results, flags = FixedWidthAdder.add_batch(WORD, [0x7fff, 0xffff, 0x0001], [0x0001, 0x0001, 0x0002])
+
+    assert list(results) == [0x8000, 0x0000, 0x0003]
+    assert list(flags) == [OVERFLOW | NEGATIVE, ZERO | CARRY, 0]
+
+def test_sub_batch():
+    results, flags = FixedWidthAdder.sub_batch(WORD, [0x8000, 0x0000], [0x0001, 0x0001])
+
+    assert list(results) == [0x7fff, 0xffff]
+    assert list(flags) == [OVERFLOW, CARRY | NEGATIVE]
+
+def test_batch_matches_scalar():
+    n1s = [0, 1, 0x7fffffff, 0x80000000, 0xffffffff, 0x12345678, 0xfffffffe]
+    n2s = [0, 0xffffffff, 1, 0x80000000, 1, 0x87654321, 0xffffffff]
+    n1s, n2s = n1s * len(n2s), [n for n in n2s for _ in n1s]
+    for size, batch, value, flags_op in (
+            (DWORD, FixedWidthAdder.add_batch, FixedWidthAdder.add_dword, FixedWidthAdder.add_dword_flags),
+            (DWORD, FixedWidthAdder.sub_batch, FixedWidthAdder.sub_dword, FixedWidthAdder.sub_dword_flags)):
+        results, flags = batch(size, n1s, n2s)
+        assert list(results) == list(map(value, n1s, n2s))
+        assert list(flags) == list(map(flags_op, n1s, n2s))
+
+def test_batch_without_numpy(monkeypatch):
+    monkeypatch.setattr(FixedWidthAdder, "np", None)
+    results, flags = FixedWidthAdder.add_batch(WORD, [0x7fff, 0xffff], [0x0001, 0x0001])
+
+    assert list(results) == [0x8000, 0x0000]
+    assert list(flags) == [OVERFLOW | NEGATIVE, ZERO | CARRY]
@@ -0,0 +1,48 @@
+from cflang.cflang.token.tokenizer import tokenize_all, retokenize
+
+def columns(table):
+    return list(table.types), list(table.starts), list(table.ends), table.end
+
+def edit(text, offset, removed, inserted):
+    table = tokenize_all("source", text)
+    changed = retokenize(table, offset, removed, inserted)
+
+    edited = text[:offset] + inserted + text[offset + removed:]
+    assert table.source_text.text == edited
+    assert columns(table) == columns(tokenize_all("source", edited))
+    return table, changed
+
+def test_only_the_edited_token_changes():
+    table, changed = edit("a = b + c;\nd = e;", 4, 1, "bb")
+    assert changed == (2, 3, 3)
+    assert table[2].buffer == "bb"
+    assert table[5].buffer == ";"
+    assert (table[6].location.line_no, table[6].location.pos) == (2, 1)
+
+def test_whitespace_edit_replaces_nothing():
+    _, changed = edit("a = b;", 1, 0, "  ")
+    assert changed == (1, 1, 1)
+
+def test_comment_hides_the_rest_of_the_line():
+    table, changed = edit("a = b + c;\nd;", 6, 0, "//")
+    assert changed == (3, 6, 3)
+    assert [t.buffer for t in table] == ["a", "=", "b", "d", ";"]
+
+    _, changed = edit("a // b c\nd;", 2, 2, "")
+    assert changed == (1, 1, 3)
+
+def test_closing_an_unterminated_string():
+    table, changed = edit("s = \"abc\nx;", 8, 0, "\"")
+    assert changed == (2, 3, 3)
+    assert table[2].value == "abc"
+
+def test_edit_just_past_a_number():
+    # 12. then a digit is a float, so the 12 has to be scanned again
+    table, changed = edit("x 12. y", 5, 1, "5")
+    assert changed == (1, 3, 2)
+    assert table[1].buffer == "12.5"
+
+def test_edits_at_the_ends():
+    edit("a b", 0, 0, "\"")
+    edit("a b", 3, 0, " // c\n")
+    edit("", 0, 0, "0x1f")
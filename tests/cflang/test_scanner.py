@@ -0,0 +1,52 @@
+import os
+from cflang.io.file_pushback_byte_stream import FilePushbackByteStream
+from cflang.cflang.token.tokenizer import Tokenizer
+from cflang.cflang.token.scanner import Scanner
+from cflang.cflang.token.token import TokenType
+
+SAMPLES = os.path.join(
+    os.path.dirname(__file__), "..", "..", "sample_data", "cflang", "token")
+
+def read_tokens(tokenizer):
+    tokens = []
+    while True:
+        t = tokenizer.next()
+        tokens.append((t.type, t.buffer, t.value, t.location.line_no, t.location.pos))
+        if t.type == TokenType.END:
+            return tokens
+
+def assert_same_tokens(path):
+    expected = read_tokens(Tokenizer(FilePushbackByteStream(path)))
+    assert read_tokens(Scanner.from_file(path)) == expected
+
+def test_matches_tokenizer_on_samples():
+    for name in sorted(os.listdir(SAMPLES)):
+        assert_same_tokens(os.path.join(SAMPLES, name))
+
+def test_matches_tokenizer_on_errors(tmp_path):
+    sources = [
+        "0x1f;0x 0.5)12.34 12. 0.x",
+        "\"a\\n\" \"bad\\q\" \"open\n'\\t' '' 'ab' '\\\n'",
+        "a // comment\n",
+        "a // comment",
+        "'\\",
+        "x *= y -> z @\r",
+        "",
+    ]
+    for n, text in enumerate(sources):
+        path = tmp_path / f"source{n}"
+        path.write_text(text, encoding="utf-8", newline="")
+        assert_same_tokens(str(path))
+
+def test_pushback_and_end():
+    scanner = Scanner("a b", "source")
+    a = scanner.next()
+    scanner.pushback(a)
+    assert not scanner.eos()
+    assert scanner.next() is a
+    assert scanner.next().buffer == "b"
+
+    end = scanner.next()
+    assert end.type == TokenType.END
+    assert (end.location.source, end.location.line_no, end.location.pos) == ("source", 1, 4)
+    assert scanner.eos()
@@ -0,0 +1,46 @@
+import os
+from cflang.cfsm.batch import run_program, run_batch, collect_programs
+from .hex_loader import hex_str_to_int_array
+
+HALTS = "01000000 03000000 01000000 02000000 02000000 14000000"
+LOOPS = "11000000 00000000"
+FAULTS = "01000000 03000000 ff000000"
+
+def write_programs(tmp_path):
+    for name, text in (("halts", HALTS), ("loops", LOOPS), ("faults", FAULTS)):
+        (tmp_path / name).write_bytes(bytes(hex_str_to_int_array(text)))
+
+def test_run_program(tmp_path):
+    write_programs(tmp_path)
+
+    result = run_program(str(tmp_path / "halts"))
+    assert (result["status"], result["exit_value"], result["steps"]) == ("halted", 5, 4)
+
+    result = run_program(str(tmp_path / "loops"), max_steps=25, slice_steps=10)
+    assert (result["status"], result["steps"]) == ("budget_exhausted", 25)
+
+    result = run_program(str(tmp_path / "loops"), timeout=0.05)
+    assert result["status"] == "timeout"
+
+    result = run_program(str(tmp_path / "faults"))
+    assert result["status"] == "fault"
+    assert "Invalid opcode" in result["fault"]
+
+def test_run_batch(tmp_path):
+    write_programs(tmp_path)
+    paths = collect_programs([str(tmp_path)])
+    results = {r["path"]: r for r in run_batch(paths, max_steps=1000, workers=2)}
+
+    assert sorted(results) == sorted(paths)
+    assert results[str(tmp_path / "halts")]["exit_value"] == 5
+    assert results[str(tmp_path / "loops")]["steps"] == 1000
+
+def test_run_program_with_cache(tmp_path):
+    write_programs(tmp_path)
+    cache_dir = tmp_path / "cache"
+
+    for _ in range(2):
+        result = run_program(str(tmp_path / "halts"), cache_dir=str(cache_dir))
+        assert (result["status"], result["exit_value"], result["steps"]) == ("halted", 5, 4)
+
+    assert len(os.listdir(cache_dir)) == 1
@@ -0,0 +1,76 @@
+from cflang.cfsm.stack_machine import StackMachine
+from cflang.cfsm.debugger import Debugger
+from cflang.cfsm.run_status import RunStatus
+from cflang.io.memory_binary_reader import MemoryBinaryReader
+from .hex_loader import hex_str_to_int_array
+
+# counts 3 down to 0, storing each value at 0x40
+PROGRAM = hex_str_to_int_array(
+    """
+    01000000 03000000  # push 3
+    0e000000           # dup (08)
+    01000000 40000000  # push 0x40
+    06000000           # store
+    0e000000           # dup (18)
+    12000000 38000000  # if 0x38
+    01000000 01000000  # push 1 (24)
+    04000000           # sub
+    11000000 08000000  # jmp 8 (30)
+    14000000           # halt (38)
+    """
+)
+
+def machine(**kwargs):
+    return StackMachine(MemoryBinaryReader(PROGRAM), mem_size=0x1000, **kwargs)
+
+def test_brk_stops_and_resumes():
+    sm = StackMachine(MemoryBinaryReader(hex_str_to_int_array(
+        "01000000 07000000 05000000 01000000 02000000 02000000 14000000")))
+
+    assert sm.run_for() == RunStatus.BREAK
+    assert sm.pc == 0xc
+    assert sm.steps == 2
+
+    assert sm.run_for() == RunStatus.HALTED
+    assert sm.run() == 9
+
+def test_breakpoint_step_and_continue():
+    for options in ({}, {"predecode": True}, {"fuse": True}, {"jit": True}):
+        sm = machine(**options)
+        debugger = Debugger(sm)
+        debugger.add_breakpoint(0x24)
+
+        hits = 0
+        while debugger.cont() == RunStatus.BREAK:
+            assert sm.pc == 0x24
+            hits += 1
+            assert debugger.step() == RunStatus.BUDGET_EXHAUSTED
+            assert sm.pc == 0x2c
+
+        assert hits == 3
+        assert sm.status == RunStatus.HALTED
+        assert sm.run() == 0
+        plain = machine()
+        plain.run()
+        assert sm.steps == plain.steps
+
+def test_watchpoint_reports_changes():
+    sm = machine()
+    debugger = Debugger(sm)
+    debugger.watch(0x40)
+
+    seen = []
+    while debugger.cont() == RunStatus.BREAK:
+        seen.append(debugger.last_watch)
+
+    assert seen == [(0x40, 0, 3), (0x40, 3, 2), (0x40, 2, 1), (0x40, 1, 0)]
+
+def test_detach_restores_plain_dispatch():
+    sm = machine(fuse=True)
+    debugger = Debugger(sm)
+    debugger.add_breakpoint(0x24)
+    debugger.watch(0x40)
+    debugger.detach()
+
+    assert not sm.traps
+    assert sm.run_for() == RunStatus.HALTED
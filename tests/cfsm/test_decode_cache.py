@@ -0,0 +1,84 @@
+import os
+import marshal
+import pytest
+from cflang.cfsm.stack_machine import StackMachine
+from cflang.cfsm import decode_cache
+from cflang.cfsm.decode_cache import DecodeCache
+from cflang.io.memory_binary_reader import MemoryBinaryReader
+from cflang.cfsm import workloads
+
+IMAGE = workloads.recursion(10, 2)
+
+def build(cache, **kwargs):
+    return StackMachine(MemoryBinaryReader(IMAGE), decode_cache=cache, **kwargs)
+
+@pytest.mark.parametrize("options", [{"predecode": True}, {"fuse": True}, {"jit": True}])
+def test_cached_table_skips_decoding(tmp_path, monkeypatch, options):
+    cache = DecodeCache(str(tmp_path))
+    first = build(cache, **options)
+    assert len(os.listdir(tmp_path)) == 1
+
+    def no_decoding(self):
+        raise AssertionError("decoded despite a cached table")
+
+    monkeypatch.setattr(StackMachine, "_predecode", no_decoding)
+    second = build(cache, **options)
+
+    assert second.decoded.keys() == first.decoded.keys()
+    assert second.run() == first.run() == 0
+    assert second.steps == first.steps
+
+def test_options_and_version_change_the_key(tmp_path, monkeypatch):
+    cache = DecodeCache(str(tmp_path))
+    build(cache, predecode=True)
+    build(cache, jit=True)
+    assert len(os.listdir(tmp_path)) == 2
+
+    monkeypatch.setattr(decode_cache, "VERSION", "other")
+    sm = StackMachine(MemoryBinaryReader(IMAGE))
+    sm.predecode = True
+    assert not cache.load(sm)
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = DecodeCache(str(tmp_path))
+    build(cache, predecode=True)
+    size = os.path.getsize(tmp_path / os.listdir(tmp_path)[0])
+    cache.max_bytes = size
+
+    build(cache, fuse=True)
+    names = os.listdir(tmp_path)
+    assert len(names) == 1
+    assert names[0] == cache.key(build(None, fuse=True)) + ".decoded"
+
+def test_version_follows_handler_source(tmp_path, monkeypatch):
+    source = tmp_path / "handlers.py"
+    source.write_text("def handler(): pass\n")
+    module = type("module", (), {"__file__": str(source)})
+    monkeypatch.setattr(decode_cache, "SOURCES", (module,))
+    before = decode_cache.version_stamp()
+    source.write_text("def handler(): return 1\n")
+
+    assert decode_cache.version_stamp() != before
+
+def test_unknown_handler_is_a_miss(tmp_path):
+    cache = DecodeCache(str(tmp_path))
+    sm = build(cache, predecode=True)
+    path = tmp_path / os.listdir(tmp_path)[0]
+    with open(path, "wb") as f:
+        marshal.dump((decode_cache.VERSION, ((0, "op", 0xee, 0, 4),)), f)
+
+    sm.decoded = {}
+    assert not cache.load(sm)
+    assert sm.decoded == {}
+
+def test_entry_evicted_while_loading(tmp_path, monkeypatch):
+    cache = DecodeCache(str(tmp_path))
+    first = build(cache, predecode=True)
+
+    def evicted(path):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, "utime", evicted)
+    first.decoded = {}
+    assert cache.load(first)
+    assert first.run() == 0
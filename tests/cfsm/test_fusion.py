@@ -0,0 +1,113 @@
+import pytest
+from cflang.cfsm.stack_machine import StackMachine
+from cflang.cfsm.run_status import RunStatus
+from cflang.cfsm.fusion import SequenceProfiler
+from cflang.cfsm.opcode import Opcode
+from cflang.io.memory_binary_reader import MemoryBinaryReader
+from .hex_loader import hex_str_to_int_array
+
+FUSED_PROGRAM = """
+    01000000 05000000  # pushi 5
+    01000000 50000000  # pushi 0x50
+    07000000           # fchi -> 2
+    0f000000           # overi
+    0f000000           # overi
+    04000000           # subi -> 3
+    01000000 03000000  # pushi 3 (20)
+    02000000           # addi -> 6
+    01000000 01000000  # pushi 1 (2c)
+    04000000           # subi
+    0e000000           # dupi
+    12000000 4c000000  # if 0->halt
+    11000000 2c000000  # jmp 2c
+    14000000           # halt (4c)
+    02000000           # 2 (50)
+    """
+
+def run_program(text, **kwargs):
+    sm = StackMachine(MemoryBinaryReader(hex_str_to_int_array(text)), **kwargs)
+    result = sm.run()
+    return sm, result
+
+def machine_state(sm):
+    return (
+        sm.pc,
+        sm.sp,
+        bytes(sm.memory),
+        sm.zero,
+        sm.negative,
+        sm.carry,
+        sm.overflow,
+    )
+
+def test_fused_matches_unfused():
+    plain, plain_result = run_program(FUSED_PROGRAM)
+    fused, fused_result = run_program(FUSED_PROGRAM, fuse=True)
+
+    assert fused_result == plain_result == 0
+    assert machine_state(fused) == machine_state(plain)
+    assert fused.steps == plain.steps
+
+def test_fused_entries_in_decode_table():
+    sm = StackMachine(MemoryBinaryReader(hex_str_to_int_array(FUSED_PROGRAM)), fuse=True)
+
+    assert sm.decoded[0x08][2] == 0x14
+    assert sm.decoded[0x14][2] == 0x20
+    assert sm.decoded[0x2c][2] == 0x38
+    assert sm.decoded[0x38][2] == 0x44
+    assert sm.decoded[0x38][1] == 0x4c
+    # the tail of a fused sequence can still be entered directly
+    assert sm.decoded[0x18][2] == 0x1c
+
+def test_sequence_profiler():
+    sm = StackMachine(MemoryBinaryReader(hex_str_to_int_array(FUSED_PROGRAM)))
+    profiler = SequenceProfiler()
+    profiler.profile(sm)
+    counts = dict(profiler.most_common())
+
+    assert sm.stop
+    assert counts[(Opcode.DUPI, Opcode.IF)] == 6
+    assert counts[(Opcode.PUSHI, Opcode.SUBI, Opcode.DUPI)] == 6
+    assert counts[(Opcode.OVERI, Opcode.OVERI, Opcode.SUBI)] == 1
+    # the jump back is not a fall through sequence
+    assert (Opcode.JMP, Opcode.PUSHI) not in counts
+
+def test_sequence_profiler_rejects_fused_machine():
+    sm = StackMachine(MemoryBinaryReader(hex_str_to_int_array(FUSED_PROGRAM)), fuse=True)
+
+    with pytest.raises(ValueError):
+        SequenceProfiler().profile(sm)
+
+FAULTING_PROGRAMS = [
+    # addi and subi read past the end of memory
+    "01000000 00000100 09000000 01000000 01000000 02000000 14000000",
+    "01000000 00000100 09000000 01000000 01000000 04000000 14000000",
+    # fchi from an address out of range
+    "01000000 10000000 01000000 0000ffff 07000000 14000000",
+    # dupi faults, the first op of its sequence
+    "01000000 00000100 09000000 0e000000 12000000 00000000 14000000",
+    # overi reads below the empty stack
+    "0f000000 0f000000 04000000 14000000",
+]
+
+@pytest.mark.parametrize("text", FAULTING_PROGRAMS)
+def test_fused_fault_matches_unfused(text):
+    states = []
+    for fuse in (False, True):
+        sm = StackMachine(MemoryBinaryReader(hex_str_to_int_array(text)), fuse=fuse)
+        sm.run_for()
+        states.append((machine_state(sm), sm.steps, sm.status,
+                       type(sm.fault), sm.fault.address))
+
+    assert states[0] == states[1]
+
+def test_fused_run_for_budget_counts_ops():
+    for budget in (1, 2, 5):
+        plain = StackMachine(MemoryBinaryReader(hex_str_to_int_array(FUSED_PROGRAM)))
+        fused = StackMachine(MemoryBinaryReader(hex_str_to_int_array(FUSED_PROGRAM)), fuse=True)
+        while plain.run_for(budget) == RunStatus.BUDGET_EXHAUSTED:
+            assert fused.run_for(budget) == RunStatus.BUDGET_EXHAUSTED
+            assert (fused.pc, fused.steps) == (plain.pc, plain.steps)
+
+        assert fused.run_for(budget) == plain.status
+        assert machine_state(fused) == machine_state(plain)
@@ -0,0 +1,98 @@
+from cflang.cfsm.stack_machine import StackMachine
+from cflang.cfsm.run_status import RunStatus
+from cflang.cfsm import jit
+from cflang.io.memory_binary_reader import MemoryBinaryReader
+from cflang.cfsm import workloads
+from .hex_loader import hex_str_to_int_array
+
+def run_both(image, **kwargs):
+    plain = StackMachine(MemoryBinaryReader(image))
+    compiled = StackMachine(MemoryBinaryReader(image), jit=True, **kwargs)
+    assert compiled.run() == plain.run()
+    return plain, compiled
+
+def assert_same_state(plain, compiled):
+    # slots below sp are dead and a block does not write them
+    assert compiled.sp == plain.sp
+    assert compiled.pc == plain.pc
+    assert compiled.steps == plain.steps
+    assert compiled.memory[compiled.sp:] == plain.memory[plain.sp:]
+    assert compiled.memory[:compiled.code_end] == plain.memory[:plain.code_end]
+    for flag in ("zero", "negative", "carry", "overflow"):
+        assert getattr(compiled, flag) == getattr(plain, flag)
+
+def test_workloads_match_interpreter():
+    for image in (
+            workloads.arith_loop(50),
+            workloads.recursion(20, 3),
+            workloads.memory_sweep(8, 3),
+            workloads.stack_shuffle(50)):
+        assert_same_state(*run_both(image))
+
+def test_blocks_are_compiled():
+    sm = StackMachine(MemoryBinaryReader(workloads.arith_loop(5)), jit=True)
+    sm.run()
+
+    handler, arg, next_pc = sm.decoded[8]
+    assert handler.__func__ is jit.compile_block(8, bytes(sm.memory[8:next_pc]))
+    assert next_pc == 20
+
+def test_store_invalidates_block():
+    image = hex_str_to_int_array(
+        """
+        01000000 03000000  # push 3
+        01000000 02000000  # push 2, patched to push 4
+        02000000           # add
+        01000000 60000000  # push flag
+        07000000           # fetch
+        12000000 30000000  # if 0x30
+        14000000           # halt
+        00000000
+        01000000 04000000  # push 4 (30)
+        01000000 0c000000  # push 0xc
+        06000000           # store
+        01000000 01000000  # push 1
+        01000000 60000000  # push flag
+        06000000           # store
+        11000000 00000000  # jmp 0
+        00000000           # flag (60)
+        """
+    )
+
+    plain, compiled = run_both(image)
+
+    assert compiled.run() == 7
+    assert compiled.words[(compiled.sp >> 2) + 1] == 5
+    assert_same_state(plain, compiled)
+
+def test_guard_falls_back_near_code():
+    # the pushes land in the last word of the image, which the interpreter
+    # treats as code
+    image = hex_str_to_int_array(
+        """
+        01000000 28000000  # push 0x28
+        09000000           # pop sp
+        01000000 05000000  # push 5
+        01000000 06000000  # push 6
+        14000000           # halt
+        00000000
+        """
+    )
+
+    plain, compiled = run_both(image)
+
+    assert compiled.run() == 6
+    assert_same_state(plain, compiled)
+    assert compiled.memory == plain.memory
+
+def test_run_for_budget_counts_ops():
+    image = workloads.recursion(20, 3)
+    for budget in (1, 7, 63, 64, 100, 1000):
+        plain = StackMachine(MemoryBinaryReader(image))
+        compiled = StackMachine(MemoryBinaryReader(image), jit=True)
+        while plain.run_for(budget) == RunStatus.BUDGET_EXHAUSTED:
+            assert compiled.run_for(budget) == RunStatus.BUDGET_EXHAUSTED
+            assert_same_state(plain, compiled)
+
+        assert compiled.run_for(budget) == plain.status
+        assert_same_state(plain, compiled)
@@ -0,0 +1,46 @@
+import mmap
+from cflang.cfsm.stack_machine import StackMachine
+from cflang.io.mmap_binary_reader import MmapBinaryReader
+from .hex_loader import hex_str_to_int_array
+
+PROGRAM = hex_str_to_int_array(
+    """
+    01000000 07000000  # pushi 7
+    01000000 40000000  # pushi 0x40
+    06000000           # storei
+    01000000 40000000  # pushi 0x40
+    07000000           # fchi
+    14000000           # halt
+    """)
+
+def write_image(path, size):
+    image = bytearray(size)
+    image[:len(PROGRAM)] = bytes(PROGRAM)
+    path.write_bytes(image)
+
+def test_mapped_image_is_copy_on_write(tmp_path):
+    path = tmp_path / "image"
+    write_image(path, 0x10000)
+
+    first = StackMachine(MmapBinaryReader(str(path)), map_image=True)
+    second = StackMachine(MmapBinaryReader(str(path)), map_image=True)
+
+    assert isinstance(first.memory, mmap.mmap)
+    assert first.code_end == len(PROGRAM)
+    assert first.run() == 7
+    assert second._read_dword_mem(0x40) == 0
+    assert path.read_bytes()[0x40:0x44] == bytes(4)
+    assert second.run() == 7
+
+# only an image file at least mem_size long is mapped, a file cannot be mapped
+# past its end. a small image in a large memory is copied instead
+def test_short_image_is_copied(tmp_path):
+    path = tmp_path / "image"
+    write_image(path, len(PROGRAM))
+
+    sm = StackMachine(MmapBinaryReader(str(path)), map_image=True, predecode=True)
+
+    assert isinstance(sm.memory, bytearray)
+    assert len(sm.memory) == sm.mem_size
+    assert sm.code_end == len(PROGRAM)
+    assert sm.run() == 7
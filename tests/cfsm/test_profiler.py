@@ -0,0 +1,52 @@
+from cflang.cfsm.stack_machine import StackMachine
+from cflang.cfsm.profiler import Profiler
+from cflang.cfsm.opcode import Opcode
+from cflang.cfsm.data_size import DWORD
+from cflang.io.memory_binary_reader import MemoryBinaryReader
+from .hex_loader import hex_str_to_int_array
+
+PROGRAM = hex_str_to_int_array(
+    """
+    01000000 01000000  # push 1
+    01000000 24000000  # push dec
+    13000000           # call dec
+    01000000 24000000  # push dec
+    13000000           # call dec
+    14000000           # halt
+    # dec routine (24)
+    10000000           # swap
+    01000000 01000000  # push 1
+    04000000           # sub
+    10000000           # swap
+    03000000           # ret
+    """)
+
+def test_profile_counts():
+    sm = StackMachine(MemoryBinaryReader(PROGRAM), fuse=True)
+    profiler = Profiler()
+    profiler.attach(sm)
+    result = sm.run()
+
+    assert result == 0xffffffff
+    assert profiler.op_counts[Opcode.CALL] == 2
+    assert profiler.op_counts[Opcode.PUSHI] == 5
+    assert profiler.pc_counts[0x24] == 2
+    assert profiler.call_counts == {0x24: 2}
+    assert profiler.max_depth == 3 * DWORD
+    assert sm.steps == sum(profiler.op_counts.values())
+    assert profiler.folded_stacks() == "0x0000 6\n0x0000;0x0024 10"
+    assert "max stack depth: 12" in profiler.report()
+
+def test_detach_restores_handlers():
+    sm = StackMachine(MemoryBinaryReader(PROGRAM))
+    plain = sm.dispatch
+    profiler = Profiler()
+    profiler.attach(sm)
+
+    assert sm.dispatch is not plain
+
+    profiler.detach()
+
+    assert sm.dispatch[Opcode.NOP].__func__ is StackMachine._nop
+    assert sm.run() == 0xffffffff
+    assert not profiler.op_counts
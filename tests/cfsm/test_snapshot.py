@@ -0,0 +1,107 @@
+import pytest
+from cflang.cfsm.stack_machine import StackMachine
+from cflang.cfsm.run_status import RunStatus
+from cflang.cfsm.machine_fault import MemoryAccessError
+from cflang.cfsm.snapshot import ZERO_PAGE
+from cflang.io.memory_binary_reader import MemoryBinaryReader
+from .hex_loader import hex_str_to_int_array
+
+# prologue stores 5 to 0x40, then the body adds whatever sits on the stack
+PROGRAM = hex_str_to_int_array(
+    """
+    01000000 05000000  # pushi 5
+    01000000 40000000  # pushi 0x40
+    06000000           # storei
+    01000000 40000000  # pushi 0x40 (14)
+    07000000           # fchi
+    02000000           # addi
+    14000000           # halt
+    """)
+
+def test_fork_after_prologue():
+    sm = StackMachine(MemoryBinaryReader(PROGRAM), predecode=True)
+    sm.run_for(3)
+    snapshot = sm.snapshot()
+
+    results = []
+    for n in (1, 10, 100):
+        fork = StackMachine.from_snapshot(snapshot)
+        fork._push_dword_sp(n)
+        results.append(fork.run())
+
+        assert fork.status == RunStatus.HALTED
+        assert fork.steps == 7
+
+    assert results == [6, 15, 105]
+    assert sm.pc == 0x14
+    assert sm.status == RunStatus.BUDGET_EXHAUSTED
+
+def test_snapshot_restores_flags_and_registers():
+    sm = StackMachine(MemoryBinaryReader(PROGRAM))
+    sm._push_dword_sp(0xffffffff)
+    sm.run()
+    snapshot = sm.snapshot()
+    fork = StackMachine.from_snapshot(snapshot)
+
+    assert (fork.pc, fork.sp, fork.bp) == (sm.pc, sm.sp, sm.bp)
+    assert (fork.zero, fork.carry, fork.negative, fork.overflow) == (False, True, False, False)
+    assert fork.memory == sm.memory
+    assert fork.stop
+
+def test_snapshot_pages_are_shared():
+    sm = StackMachine(MemoryBinaryReader(PROGRAM))
+    sm.run_for(3)
+    first = sm.snapshot()
+    fork = StackMachine.from_snapshot(first)
+    fork.run()
+    second = fork.snapshot()
+
+    changed = [n for n, page in enumerate(second.pages) if page is not first.pages[n]]
+
+    # only the stack page differs, everything else is the same object
+    assert changed == [len(first.pages) - 1]
+    assert first.pages[1] is ZERO_PAGE
+
+def test_fork_shares_decoded_table():
+    sm = StackMachine(MemoryBinaryReader(PROGRAM), predecode=True)
+    sm.run_for(3)
+    snapshot = sm.snapshot()
+    fork = StackMachine.from_snapshot(snapshot)
+
+    # nothing is decoded again, entries are bound as the fork reaches them
+    assert fork.decoded == {}
+    assert set(snapshot.decoded) == set(sm.decoded)
+    fork._push_dword_sp(1)
+    assert fork.run() == 6
+    assert set(fork.decoded) == {0x14, 0x1c, 0x20, 0x24}
+
+def test_fork_copies_shared_table_on_code_write():
+    program = hex_str_to_int_array(
+        """
+        01000000 07000000  # pushi 7
+        01000000 1c000000  # pushi 0x1c (immediate of the pushi at 0x18)
+        06000000           # storei
+        00000000           # nop
+        01000000 03000000  # pushi 3, patched to pushi 7
+        14000000           # halt
+        """)
+    for options in ({"predecode": True}, {"fuse": True}, {"jit": True}):
+        sm = StackMachine(MemoryBinaryReader(program), **options)
+        snapshot = sm.snapshot()
+        shared = dict(snapshot.decoded)
+        fork = StackMachine.from_snapshot(snapshot)
+
+        assert fork.run() == 7
+        assert fork.shared_decoded is None
+        assert snapshot.decoded == shared
+        assert StackMachine.from_snapshot(snapshot).run() == 7
+
+def test_fork_of_faulted_machine():
+    sm = StackMachine(MemoryBinaryReader(hex_str_to_int_array("02000000 14000000")))
+    sm.run_for()
+    fork = StackMachine.from_snapshot(sm.snapshot())
+
+    assert fork.status == RunStatus.FAULT
+    assert fork.fault is sm.fault
+    with pytest.raises(MemoryAccessError):
+        fork.run()
@@ -1,4 +1,5 @@
-from cflang.cfsm.stack_machine import StackMachine
+from cflang.cfsm.stack_machine import StackMachine, StructWordView, InvalidOpcodeError, MemoryAccessError
+from cflang.cfsm.run_status import RunStatus
 from cflang.io.memory_binary_reader import MemoryBinaryReader
 from .hex_loader import hex_str_to_int_array
 from cflang.cfsm.data_size import DWORD
@@ -88,6 +89,63 @@ def test_fetch_and_store():
     assert sm.negative
     assert get_dword_from_mem(sm.memory, 0x28) == 0xffffffff
 
+def test_fetch_and_store_unaligned():
+    reader = MemoryBinaryReader(
+       hex_str_to_int_array(
+           """
+           01000000 1d000000  # pushi 0x1d
+           07000000           # fetchi
+           01000000 26000000  # pushi 0x26
+           06000000           # storei
+           14000000           # halt
+           aabbccdd eeff0011  # 0x1c
+           00000000 00000000  # 0x24
+           """)
+    )
+
+    sm = StackMachine(reader)
+    sm.run()
+
+    assert isinstance(sm.memory, bytearray)
+    assert sm.negative
+    assert get_dword_from_mem(sm.memory, 0x1d) == 0xeeddccbb
+    assert get_dword_from_mem(sm.memory, 0x26) == 0xeeddccbb
+
+def test_add_carry_survives_value_ops():
+    reader = MemoryBinaryReader(
+       hex_str_to_int_array(
+           """
+           01000000 ffffffff  # pushi 0xffffffff
+           01000000 01000000  # pushi 1
+           02000000           # addi, carries to 0
+           01000000 00000080  # pushi 0x80000000
+           14000000           # halt
+           """)
+    )
+
+    sm = StackMachine(reader)
+    result = sm.run()
+
+    assert result == 0x80000000
+    assert sm.carry
+    assert not sm.zero
+    assert not sm.overflow
+    assert sm.negative
+
+def test_add_with_overflow():
+    reader = MemoryBinaryReader(
+       hex_str_to_int_array("01000000 ffffff7f 01000000 01000000 02000000 14000000")
+    )
+
+    sm = StackMachine(reader)
+    result = sm.run()
+
+    assert result == 0x80000000
+    assert not sm.carry
+    assert not sm.zero
+    assert sm.overflow
+    assert sm.negative
+
 def test_and_numbers():
     reader = MemoryBinaryReader(
        hex_str_to_int_array("01000000 0f0f0f0f 01000000 ffffffff 0b000000 14000000")
@@ -323,6 +381,153 @@ def test_call_using_bp_instruction():
     assert get_dword_from_mem(sm.memory, 0x5c) == 0
     assert get_dword_from_mem(sm.memory, 0x60) == 9
 
+def test_predecoded_call_using_bp():
+    reader = MemoryBinaryReader(
+        hex_str_to_int_array(
+            """
+            01000000 0a000000  # push 10
+            01000000 20000000  # push dec
+            13000000           # call dec
+            10000000           # swap
+            0a000000           # drop input
+            14000000           # halt
+            # dec routine (20)
+            08000000           # push sp
+            09000001           # pop bp
+            08000001           # push bp
+            01000000 04000000
+            02000000           # bp+4
+            07000000           # fetchi bp+4
+            01000000 01000000  # push 1
+            04000000           # sub
+            10000000           # swap
+            03000000           # ret
+            """)
+    )
+
+    sm = StackMachine(reader, predecode=True)
+    result = sm.run()
+
+    assert result == 9
+    assert sm.code_end == 0x50
+    assert 0x20 in sm.decoded
+    assert sm.bp == sm.empty_sp - 2 * DWORD
+
+def test_predecoded_store_into_code():
+    program = hex_str_to_int_array(
+        """
+        01000000 07000000  # pushi 7
+        01000000 1c000000  # pushi 0x1c (immediate of the pushi at 0x18)
+        06000000           # storei
+        00000000           # nop
+        01000000 03000000  # pushi 3, patched to pushi 7
+        14000000           # halt
+        """)
+
+    for predecode in (False, True):
+        sm = StackMachine(MemoryBinaryReader(program), predecode=predecode)
+        result = sm.run()
+
+        assert result == 7
+
+def test_run_for_budget():
+    reader = MemoryBinaryReader(
+        hex_str_to_int_array(
+            """
+            01000000 03000000  # pushi 3
+            01000000 01000000  # pushi 1 (08)
+            04000000           # subi
+            0e000000           # dupi
+            12000000 28000000  # if 0->halt
+            11000000 08000000  # jmp 08
+            14000000           # halt (28)
+            """)
+    )
+
+    sm = StackMachine(reader)
+    status = sm.run_for(10)
+
+    assert status == RunStatus.BUDGET_EXHAUSTED
+    assert sm.steps == 10
+    assert sm.pc == 0x20
+
+    status = sm.run_for(100)
+
+    assert status == RunStatus.HALTED
+    assert sm.steps == 16
+    assert sm.pc == 0x2c
+    assert sm.run_for(100) == RunStatus.HALTED
+    assert sm.steps == 16
+    assert sm.run() == 0
+
+def test_run_for_fault():
+    reader = MemoryBinaryReader(
+        hex_str_to_int_array("01000000 03000000 ff000000 14000000")
+    )
+
+    sm = StackMachine(reader)
+    status = sm.run_for()
+
+    assert status == RunStatus.FAULT
+    assert isinstance(sm.fault, InvalidOpcodeError)
+    assert sm.fault.offset == 8
+    assert sm.pc == 8
+    assert sm.steps == 1
+
+def test_run_for_memory_fault():
+    reader = MemoryBinaryReader(
+        hex_str_to_int_array("01000000 00000100 07000000 14000000")
+    )
+
+    sm = StackMachine(reader)
+    status = sm.run_for()
+
+    assert status == RunStatus.FAULT
+    assert isinstance(sm.fault, MemoryAccessError)
+    assert sm.fault.address == 0x10000
+    assert sm.pc == 8
+
+def test_stack_underflow_fault():
+    reader = MemoryBinaryReader(
+        hex_str_to_int_array("02000000 14000000")
+    )
+
+    sm = StackMachine(reader)
+    status = sm.run_for()
+
+    # the first pop succeeds and moves sp before the second one faults
+    assert status == RunStatus.FAULT
+    assert sm.fault.address == 0x10000
+    assert sm.sp == 0x10000
+
+def test_stack_pointer_wraps():
+    reader = MemoryBinaryReader(
+        hex_str_to_int_array(
+            """
+            01000000 00000000  # push 0
+            09000000           # pop sp
+            01000000 01000000  # push 1
+            """
+        )
+    )
+
+    sm = StackMachine(reader)
+    status = sm.run_for()
+
+    assert status == RunStatus.FAULT
+    assert sm.fault.address == 0xfffffffc
+    assert sm.sp == 0xfffffffc
+
+def test_bad_register():
+    reader = MemoryBinaryReader(hex_str_to_int_array("08000003"))
+
+    sm = StackMachine(reader)
+    status = sm.run_for()
+
+    assert status == RunStatus.FAULT
+    assert isinstance(sm.fault, InvalidOpcodeError)
+    assert sm.fault.offset == 0
+
 
 # def test_sample():
 #     reader = MemoryBinaryReader(
@@ -335,4 +540,18 @@ def test_call_using_bp_instruction():
 #     sm = StackMachine(reader)
 #     result = sm.run()
 
-#     # assert
\ No newline at end of file
+#     # assert
+def test_struct_word_view_faults():
+    programs = [
+        # dropi pops past the end of memory
+        ("01000000 00000100 09000000 0a000000 14000000", 0x10000),
+        # pushi wraps sp below zero
+        ("01000000 00000000 09000000 01000000 01000000 14000000", 0xfffffffc),
+    ]
+    for text, address in programs:
+        sm = StackMachine(MemoryBinaryReader(hex_str_to_int_array(text)))
+        sm.words = StructWordView(sm.memory)
+
+        assert sm.run_for() == RunStatus.FAULT
+        assert isinstance(sm.fault, MemoryAccessError)
+        assert sm.fault.address == address
@@ -0,0 +1,55 @@
+import io
+from cflang.cfsm.stack_machine import StackMachine
+from cflang.cfsm.trace import Tracer, TraceRecord, read_trace, filter_trace, format_record
+from cflang.cfsm.opcode import Opcode
+from cflang.cfsm.flag_result import ZERO, CARRY, NEGATIVE
+from cflang.io.memory_binary_reader import MemoryBinaryReader
+from .hex_loader import hex_str_to_int_array
+
+PROGRAM = hex_str_to_int_array(
+    """
+    01000000 ffffffff  # push -1
+    01000000 01000000  # push 1
+    02000000           # add
+    14000000           # halt
+    """
+)
+
+def test_ring_keeps_latest_records():
+    sm = StackMachine(MemoryBinaryReader(PROGRAM), fuse=True)
+    tracer = Tracer(capacity=3)
+    tracer.attach(sm)
+    sm.run()
+
+    assert tracer.count == 4
+    assert tracer.records() == [
+        TraceRecord(0x8, Opcode.PUSHI, NEGATIVE, 1, 0xfff8),
+        TraceRecord(0x10, Opcode.ADDI, 0, 0, 0xfff4),
+        TraceRecord(0x14, Opcode.HALT, ZERO | CARRY, 0, 0xfff8),
+    ]
+
+def test_stream_and_read_back(tmp_path):
+    stream = io.BytesIO()
+    sm = StackMachine(MemoryBinaryReader(PROGRAM))
+    tracer = Tracer(capacity=2, stream=stream)
+    tracer.attach(sm)
+    sm.run()
+    tracer.detach()
+
+    path = tmp_path / "trace"
+    path.write_bytes(stream.getvalue())
+    records = list(read_trace(path))
+
+    assert [record.pc for record in records] == [0, 8, 0x10, 0x14]
+    assert list(filter_trace(records, opcodes={Opcode.PUSHI}, pcs={8})) == [records[1]]
+    assert format_record(records[-1]) == "0x0014 HALT   0x00000000 sp=0xfff8 Z-C-"
+
+def test_dump_matches_records(tmp_path):
+    sm = StackMachine(MemoryBinaryReader(PROGRAM))
+    tracer = Tracer(capacity=3)
+    tracer.attach(sm)
+    sm.run()
+
+    path = tmp_path / "trace"
+    tracer.dump(path)
+    assert list(read_trace(path)) == tracer.records()
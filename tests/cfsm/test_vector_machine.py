@@ -0,0 +1,101 @@
+import pytest
+from cflang.cfsm.stack_machine import StackMachine
+from cflang.cfsm.run_status import RunStatus
+from cflang.cfsm.machine_fault import CodeWriteError, MemoryAccessError
+from cflang.io.memory_binary_reader import MemoryBinaryReader
+from cflang.cfsm import workloads
+from .hex_loader import hex_str_to_int_array
+
+np = pytest.importorskip("numpy")
+from cflang.cfsm.vector_machine import VectorStackMachine
+
+# sums 1..n for the n on the stack
+SUM_TO_N = bytes(hex_str_to_int_array(
+    """
+    01000000 00000000  # push 0
+    0f000000           # over (08)
+    12000000 38000000  # if end
+    0f000000           # over
+    02000000           # add
+    10000000           # swap
+    01000000 01000000  # push 1
+    04000000           # sub
+    10000000           # swap
+    11000000 08000000  # jmp 8
+    10000000           # swap (38)
+    0a000000           # drop
+    14000000           # halt
+    """
+))
+
+def scalar_run(image, value=None):
+    sm = StackMachine(MemoryBinaryReader(image), mem_size=0x4000)
+    if value is not None:
+        sm._push_dword_sp(value)
+
+    result = sm.run()
+    return sm, result
+
+def test_lanes_diverge_and_match_scalar():
+    inputs = [0, 1, 5, 3, 10, 7]
+    vm = VectorStackMachine(MemoryBinaryReader(SUM_TO_N), len(inputs), mem_size=0x4000)
+    vm.push(inputs)
+    results = vm.run()
+
+    assert list(results) == [n * (n + 1) // 2 for n in inputs]
+    for lane, n in enumerate(inputs):
+        sm, _ = scalar_run(SUM_TO_N, n)
+        assert vm.lane_status(lane) == RunStatus.HALTED
+        assert vm.steps[lane] == sm.steps
+        assert vm.sp[lane] == sm.sp
+        assert vm.zero[lane] == sm.zero
+        assert vm.carry[lane] == sm.carry
+        assert vm.overflow[lane] == sm.overflow
+
+def test_workloads_match_scalar():
+    for image in (
+            workloads.recursion(10, 2),
+            workloads.memory_sweep(4, 3),
+            workloads.stack_shuffle(5)):
+        vm = VectorStackMachine(MemoryBinaryReader(image), 3)
+        sm = StackMachine(MemoryBinaryReader(image))
+        assert list(vm.run()) == [sm.run()] * 3
+        assert bytes(vm.memory[2]) == bytes(sm.memory)
+
+def test_faults_are_per_lane():
+    # stores the input to itself, so lanes holding code addresses fault
+    image = hex_str_to_int_array("0e000000 06000000 14000000")
+    vm = VectorStackMachine(MemoryBinaryReader(image), 3, mem_size=0x1000)
+    vm.push([0x800, 0x4, 0x2000])
+    vm.run()
+
+    assert [vm.lane_status(lane) for lane in range(3)] == [
+        RunStatus.HALTED, RunStatus.FAULT, RunStatus.FAULT]
+    assert isinstance(vm.faults[1], CodeWriteError)
+    assert isinstance(vm.faults[2], MemoryAccessError)
+    assert vm.pc[1] == 4
+    assert vm.words[0][0x200] == 0x800
+
+def test_budget():
+    vm = VectorStackMachine(MemoryBinaryReader(SUM_TO_N), 2, mem_size=0x4000)
+    vm.push([1, 1000])
+    vm.run(max_steps=100)
+
+    assert vm.lane_status(0) == RunStatus.HALTED
+    assert vm.lane_status(1) == RunStatus.BUDGET_EXHAUSTED
+    assert vm.steps[1] == 100
+
+@pytest.mark.parametrize("text", [
+    # pushi 1, pushi 2, addi, pushi 0x80000000
+    "01000000 01000000 01000000 02000000 02000000 01000000 00000080 14000000",
+    # pushi 0x80000000, pushi 1, subi (overflows), pushi 0x80000000
+    "01000000 00000080 01000000 01000000 04000000 01000000 00000080 14000000",
+])
+def test_flags_after_push_match_scalar(text):
+    image = bytes(hex_str_to_int_array(text))
+    vm = VectorStackMachine(MemoryBinaryReader(image), 2, mem_size=0x4000)
+    vm.run()
+    sm, _ = scalar_run(image)
+
+    for flag in ("zero", "negative", "carry", "overflow"):
+        assert list(getattr(vm, flag)) == [getattr(sm, flag)] * 2
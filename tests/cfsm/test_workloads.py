@@ -0,0 +1,44 @@
+from cflang.cfsm.stack_machine import StackMachine, DWORD_STRUCT
+from cflang.io.memory_binary_reader import MemoryBinaryReader
+from cflang.cfsm import workloads
+
+def run(image, **kwargs):
+    sm = StackMachine(MemoryBinaryReader(image), **kwargs)
+    return sm, sm.run()
+
+def test_arith_loop():
+    sm, result = run(workloads.arith_loop(10))
+    assert result == 0
+    assert sm.sp == sm.empty_sp - 4
+
+def test_recursion():
+    sm, result = run(workloads.recursion(20, 3), predecode=True)
+    assert result == 0
+    assert sm.sp == sm.empty_sp - 4
+
+def test_memory_sweep():
+    sm, result = run(workloads.memory_sweep(8, 5), fuse=True)
+    assert result == 0
+    for i in range(8):
+        assert DWORD_STRUCT.unpack_from(sm.memory, workloads.DATA_BASE + i * 4)[0] == 5
+
+def test_stack_shuffle():
+    sm, result = run(workloads.stack_shuffle(10))
+    assert result == 0
+    assert sm.sp == sm.empty_sp - 4
+
+def test_compare_flags_regressions():
+    baseline = {
+        "a": {"ips": 1000.0, "load_time": 0.01},
+        "b": {"ips": 1000.0, "load_time": 0.01},
+    }
+    results = {
+        "a": {"ips": 950.0, "load_time": 0.0105},
+        "b": {"ips": 800.0, "load_time": 0.02},
+        "c": {"ips": 1.0, "load_time": 1.0},
+    }
+
+    assert workloads.compare(results, baseline) == [
+        ("b", "ips", 1000.0, 800.0),
+        ("b", "load_time", 0.01, 0.02),
+    ]
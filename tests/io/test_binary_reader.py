@@ -0,0 +1,44 @@
+import pytest
+from cflang.io.binary_reader import EndOfFileBinaryReader
+from cflang.io.file_binary_reader import FileBinaryReader
+from cflang.io.memory_binary_reader import MemoryBinaryReader
+
+DATA = [1, 0, 0, 0, 3, 0, 0, 0, 0xff]
+
+def test_memory_read_bytes():
+    reader = MemoryBinaryReader(DATA)
+    into = bytearray(16)
+    n = reader.read_bytes(into)
+
+    assert n == len(DATA)
+    assert into[:n] == bytes(DATA)
+    assert reader.read_bytes(into) == 0
+
+def test_read_bytes_after_byte():
+    reader = MemoryBinaryReader(DATA)
+
+    assert reader.read_dword() == 1
+    into = [0] * 8
+    n = reader.read_bytes(into)
+
+    assert n == 5
+    assert into == [3, 0, 0, 0, 0xff, 0, 0, 0]
+
+def test_file_read_bytes(tmp_path):
+    path = tmp_path / "image"
+    path.write_bytes(bytes(DATA))
+    reader = FileBinaryReader(str(path))
+
+    assert reader.read_dword() == 1
+    assert reader.read_dword() == 3
+    with pytest.raises(EndOfFileBinaryReader):
+        reader.read_dword()
+
+def test_file_read_bytes_whole_image(tmp_path):
+    path = tmp_path / "image"
+    path.write_bytes(bytes(range(256)) * 256)
+    reader = FileBinaryReader(str(path))
+    into = bytearray(0x10000 + 4)
+
+    assert reader.read_bytes(into) == 0x10000
+    assert into[:0x10000] == path.read_bytes()
@@ -0,0 +1,66 @@
+import os
+from cflang.io.file_pushback_byte_stream import FilePushbackByteStream
+from cflang.cflang.token.tokenizer import Tokenizer
+from cflang.cflang.token.token import TokenType
+
+SAMPLES = os.path.join(
+    os.path.dirname(__file__), "..", "..", "sample_data", "cflang", "token")
+
+def read_all(stream):
+    chars = []
+    while not stream.eos():
+        chars.append(stream.next())
+
+    return "".join(chars)
+
+def test_decodes_utf8_across_chunks(tmp_path):
+    path = tmp_path / "source"
+    path.write_bytes("a日\n本語\xff".encode() + b"\xff")
+
+    for chunk_size in (1, 2, 1 << 16):
+        stream = FilePushbackByteStream(str(path), chunk_size=chunk_size)
+        assert read_all(stream) == "a日\n本語\xff?"
+        assert stream.next() == ''
+
+def test_locations_follow_pushback(tmp_path):
+    path = tmp_path / "source"
+    path.write_text("ab\ncd\n")
+
+    stream = FilePushbackByteStream(str(path), chunk_size=2)
+    for _ in range(4):
+        stream.next()
+
+    location = stream.get_location()
+    assert (location.line_no, location.pos) == (2, 2)
+
+    stream.pushback("c")
+    stream.pushback("\n")
+    location = stream.get_location()
+    assert (location.line_no, location.pos) == (1, 3)
+    assert read_all(stream) == "\ncd\n"
+
+    location = stream.get_location()
+    assert (location.line_no, location.pos) == (3, 1)
+
+def test_read_all_from_the_cursor(tmp_path):
+    path = tmp_path / "source"
+    path.write_text("ab\ncd\nef")
+
+    stream = FilePushbackByteStream(str(path), chunk_size=3)
+    stream.next()
+    assert stream.read_all() == "b\ncd\nef"
+    assert stream.eos()
+
+    location = stream.get_location()
+    assert (location.line_no, location.pos) == (3, 3)
+
+def test_tokenizes_multibyte_strings():
+    stream = FilePushbackByteStream(os.path.join(SAMPLES, "string.cflang"))
+    tokenizer = Tokenizer(stream)
+    strings = []
+    while not tokenizer.eos():
+        token = tokenizer.next()
+        if token.type == TokenType.STRING:
+            strings.append(token.value)
+
+    assert "日本語" in strings
@@ -0,0 +1,63 @@
+from cflang.io.mmap_pushback_byte_stream import MmapPushbackByteStream
+
+def read_all(stream):
+    chars = []
+    while not stream.eos():
+        chars.append(stream.next())
+
+    return "".join(chars)
+
+def test_reads_utf8(tmp_path):
+    path = tmp_path / "source"
+    path.write_bytes("a日\n本語".encode() + b"\xff\xe6")
+
+    stream = MmapPushbackByteStream(str(path))
+    assert read_all(stream) == "a日\n本語??"
+    assert stream.next() == ''
+    stream.close()
+
+def test_pushback_and_locations(tmp_path):
+    path = tmp_path / "source"
+    path.write_text("ab\n日本\n", encoding="utf-8")
+
+    stream = MmapPushbackByteStream(str(path))
+    for _ in range(5):
+        stream.next()
+
+    location = stream.get_location()
+    assert (location.line_no, location.pos) == (2, 3)
+
+    stream.pushback("本")
+    stream.pushback("日")
+    stream.pushback("\n")
+    location = stream.get_location()
+    assert (location.line_no, location.pos) == (1, 3)
+    assert read_all(stream) == "\n日本\n"
+
+    location = stream.get_location()
+    assert (location.line_no, location.pos) == (3, 1)
+
+def test_read_all(tmp_path):
+    path = tmp_path / "source"
+    path.write_bytes("a日本".encode())
+
+    stream = MmapPushbackByteStream(str(path))
+    stream.next()
+    assert stream.read_all() == "日本"
+    assert stream.eos()
+    stream.close()
+
+    path.write_bytes(b"a\xff\xe6\x97b")
+    stream = MmapPushbackByteStream(str(path))
+    assert stream.read_all() == "a???b"
+    stream.close()
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "source"
+    path.write_bytes(b"")
+
+    stream = MmapPushbackByteStream(str(path))
+    assert stream.eos()
+    assert stream.next() == ''
+    location = stream.get_location()
+    assert (location.line_no, location.pos) == (1, 1)
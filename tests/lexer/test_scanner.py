@@ -0,0 +1,82 @@
+from cflang.lexer.language import Language
+from cflang.lexer.scanner import Scanner
+from cflang.io.file_pushback_byte_stream import FilePushbackByteStream
+from cflang.cfasm.token.tokenizer import Tokenizer as AsmTokenizer, LANGUAGE as ASM
+from cflang.cflang.token.tokenizer import LANGUAGE as CFLANG
+from cflang.cflang.token.token import TokenType
+
+def read_tokens(tokenizer):
+    tokens = []
+    while True:
+        t = tokenizer.next()
+        tokens.append((t.type.name, t.buffer, t.value, t.location.line_no, t.location.pos))
+        if t.type.name == "END":
+            return tokens
+
+def test_cfasm_newlines_and_comments():
+    text = "push #3 ; load 3\n  .ds \"a\\b\",0x1f\nx"
+    assert read_tokens(Scanner(ASM, text, "source", 3, 5)) == [
+        ("ID", "push", None, 3, 5),
+        ("POUND", "#", None, 3, 10),
+        ("INTEGER", "3", None, 3, 11),
+        ("NEWLINE", "\n", None, 3, 21),
+        ("DOT", ".", None, 4, 3),
+        ("ID", "ds", None, 4, 4),
+        ("STRING", "\"a\\b\"", "a\\b", 4, 7),
+        ("COMMA", ",", None, 4, 12),
+        # the newline after a hex literal is dropped, as it always was
+        ("INTEGER", "0x1f", None, 4, 13),
+        ("ID", "x", None, 5, 1),
+        ("END", "", None, 5, 2),
+    ]
+
+def test_cflang_escapes_and_floats():
+    text = "x -> 1.5 // c\n'\\n' \"s\\t\""
+    assert read_tokens(Scanner(CFLANG, text, "source")) == [
+        ("ID", "x", None, 1, 1),
+        ("ARROW", "->", None, 1, 3),
+        ("FLOAT", "1.5", None, 1, 6),
+        ("CHAR", "'\\n'", "\n", 2, 1),
+        ("STRING", "\"s\\t\"", "s\t", 2, 6),
+        ("END", "", None, 2, 11),
+    ]
+
+def test_tables_drive_the_scanner():
+    language = Language(
+        TokenType, {"+": TokenType.PLUS},
+        reserved={"true": TokenType.TRUE}, comment="#")
+    assert read_tokens(Scanner(language, "true+a # note\n;")) == [
+        ("TRUE", "true", None, 1, 1),
+        ("PLUS", "+", None, 1, 5),
+        ("ID", "a", None, 1, 6),
+        ("ERROR", ";", None, 2, 1),
+        ("END", "", None, 2, 2),
+    ]
+
+def test_tokenizer_starts_where_the_stream_is(tmp_path):
+    path = tmp_path / "source.cfasm"
+    path.write_text("skip\nadd ; x")
+
+    stream = FilePushbackByteStream(str(path))
+    for _ in range(6):
+        stream.next()
+
+    assert read_tokens(AsmTokenizer(stream)) == [
+        ("ID", "dd", None, 2, 2),
+        ("END", "", None, 2, 5),
+    ]
+
+def test_tokens_are_spans_of_the_text():
+    scanner = Scanner(CFLANG, "a\n  \"x\\ty\" 0x1f;", "source")
+    scanner.next()
+    string = scanner.next()
+    number = scanner.next()
+    assert (string.start, string.end) == (4, 10)
+    assert (number.start, number.end) == (11, 15)
+    # nothing is indexed until a location is asked for
+    assert scanner.table.source_text.line_starts is None
+
+    assert (string.buffer, string.value) == ("\"x\\ty\"", "x\ty")
+    assert (number.buffer, number.value) == ("0x1f", None)
+    assert (string.location.line_no, string.location.pos) == (2, 3)
+    assert scanner.table.source_text.line_starts == [0, 2]
@@ -0,0 +1,49 @@
+import os
+from cflang.lexer.scanner import TokenReader
+from cflang.io.file_pushback_byte_stream import FilePushbackByteStream
+from cflang.cflang.token.tokenizer import Tokenizer, tokenize_all
+from cflang.cflang.token.token import TokenType
+from cflang.cfasm.token.tokenizer import tokenize_all as tokenize_asm
+
+SAMPLES = os.path.join(os.path.dirname(__file__), "..", "..", "sample_data")
+
+def fields(t):
+    return (t.type, t.buffer, t.value, t.location.line_no, t.location.pos)
+
+def test_table_holds_the_tokenizer_tokens():
+    path = os.path.join(SAMPLES, "cflang", "token", "literals.cflang")
+    table = tokenize_all(path)
+
+    tokenizer = Tokenizer(FilePushbackByteStream(path))
+    expected = []
+    while not tokenizer.eos():
+        expected.append(fields(tokenizer.next()))
+
+    assert len(table) == len(expected)
+    assert [fields(t) for t in table] == expected
+    assert fields(table[5]) == expected[5]
+    assert fields(table[-1]) == expected[-1]
+    assert [table.type(i) for i in range(len(table))] == [e[0] for e in expected]
+
+def test_columns():
+    table = tokenize_all("source", "x = 0x1f;\n  y")
+    assert list(table.types) == [
+        TokenType.ID.value, TokenType.EQUAL.value, TokenType.INTEGER.value,
+        TokenType.ID.value]
+    # the ; after the hex digits is dropped
+    assert list(table.starts) == [0, 2, 4, 12]
+    assert list(table.ends) == [1, 3, 8, 13]
+    assert table.end == 13
+    assert table.index(5) == 3
+    assert table.index(12) == 3
+
+def test_reader_adapts_a_table():
+    table = tokenize_asm("source", "add ; x\nret")
+    reader = TokenReader(table)
+    names = []
+    while not reader.eos():
+        names.append(reader.next().type.name)
+
+    end = reader.next()
+    assert names == ["ID", "NEWLINE", "ID"]
+    assert (end.type.name, end.location.line_no, end.location.pos) == ("END", 2, 4)